@@ -0,0 +1,53 @@
+import threading
+
+from backends.base import Backends, LLMBackend, OCRBackend, StorageBackend
+
+# Config keys that change how backends are built: a new RUN_ID, bucket or
+# path must not cost a new set of clients
+_BACKEND_CONFIG_KEYS = (
+    "BACKEND",
+    "PROJECT_ID",
+    "LOCATION",
+    "PROCESSOR_ID",
+    "LLM_MODEL",
+    "LLM_CACHE_TTL_S",
+    "LLM_CACHE_MIN_TOKENS",
+)
+_backends: dict[tuple, Backends] = {}
+_lock = threading.Lock()
+
+
+def get_backends(config: dict) -> Backends:
+    """
+    Returns the storage / OCR / LLM backends selected by ``config['BACKEND']``:
+    ``gcp`` (default, real Google Cloud APIs) or ``fake`` (local stand-ins).
+
+    Backends (and the clients they hold) are built once per process and
+    shared by every stage; the backend modules, and the SDKs behind them,
+    are only imported when selected.
+    """
+    name = (config.get("BACKEND") or "gcp").lower()
+    key = tuple(
+        (k, str(v))
+        for k, v in sorted(config.items())
+        if k in _BACKEND_CONFIG_KEYS or k.startswith("FAKE_")
+    )
+    with _lock:
+        if key not in _backends:
+            if name == "gcp":
+                from backends.gcp import build_backends
+            elif name == "fake":
+                from backends.fake import build_backends
+            else:
+                raise ValueError(f"Unknown BACKEND '{name}', expected 'gcp' or 'fake'")
+            _backends[key] = build_backends(config)
+        return _backends[key]
+
+
+__all__ = [
+    "Backends",
+    "LLMBackend",
+    "OCRBackend",
+    "StorageBackend",
+    "get_backends",
+]
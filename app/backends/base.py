@@ -0,0 +1,75 @@
+from abc import ABC, abstractmethod
+from typing import Any, NamedTuple
+
+from utils.metrics import run_metrics
+
+
+class StorageBackend(ABC):
+    """Object storage (GCS buckets or a local stand-in)."""
+
+    @abstractmethod
+    def list_blobs(self, bucket_name: str) -> list[str]:
+        """Returns the names of every object in the bucket."""
+
+    @abstractmethod
+    def download(self, bucket_name: str, blob_name: str, file_path: str):
+        """Copies an object to a local file."""
+
+    @abstractmethod
+    def upload(self, file_path: str, bucket_name: str, blob_name: str):
+        """Copies a local file to an object."""
+
+
+class OCRBackend(ABC):
+    """Full-text extraction from a local document."""
+
+    def process(self, file_path: str) -> str:
+        run_metrics.count_call("ocr")
+        return self._process(file_path)
+
+    @abstractmethod
+    def _process(self, file_path: str) -> str: ...
+
+
+class LLMBackend(ABC):
+    """Multimodal generative model returning the raw text of the response."""
+
+    # Static prefix of every request, see with_system_instruction()
+    system_instruction: str | None = None
+    context_cached: bool = False
+
+    def generate(self, contents: list[Any]) -> str:
+        run_metrics.count_call("llm")
+        # Rough input size: text parts, plus the system instruction unless the
+        # backend holds it as cached context
+        prompt_chars = sum(len(c) for c in contents if isinstance(c, str))
+        if self.system_instruction:
+            key = "llm_cached_chars" if self.context_cached else "llm_prompt_chars"
+            run_metrics.count_usage(key, len(self.system_instruction))
+        run_metrics.count_usage("llm_prompt_chars", prompt_chars)
+        return self._generate(contents)
+
+    @abstractmethod
+    def _generate(self, contents: list[Any]) -> str: ...
+
+    @abstractmethod
+    def file_part(self, data: bytes, mime_type: str) -> Any:
+        """Wraps raw file bytes so they can be passed in ``contents``."""
+
+    @abstractmethod
+    def with_system_instruction(
+        self, instruction: str, *, cache: bool = True
+    ) -> "LLMBackend":
+        """
+        Returns a backend that prepends ``instruction`` to every request.
+
+        With ``cache=True`` the instruction is registered once as cached
+        context where the backend supports it; otherwise (or if that fails)
+        it is sent as a plain system instruction with each request.
+        """
+
+
+class Backends(NamedTuple):
+    storage: StorageBackend
+    ocr: OCRBackend
+    llm: LLMBackend
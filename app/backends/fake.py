@@ -0,0 +1,175 @@
+"""
+Local stand-ins for GCS, Document AI and Gemini.
+
+They never touch the network, so the whole pipeline can be benchmarked for
+free. Each call sleeps for a log-normal latency (median + sigma) and fails
+with a configurable probability, mimicking the behaviour of the real APIs.
+
+Buckets are plain directories under ``FAKE_ROOT``; OCR reads the text
+streams of the synthetic PDFs written by ``benchmarks/corpus.py`` and the
+LLM answers with the JSON the prompts ask for, parsed from that text.
+"""
+
+import json
+import os
+import random
+import re
+import shutil as sh
+import threading
+import time
+
+from backends.base import Backends, LLMBackend, OCRBackend, StorageBackend
+
+_TJ_RE = re.compile(rb"\(((?:[^()\\]|\\.)*)\)\s*Tj")
+_PAGE_RE = re.compile(rb"/Type\s*/Page\b")
+_FIELD_RE = {
+    "File_Name": re.compile(r"\bFILENAME:\s*(.+)$", re.MULTILINE),
+    "Nome": re.compile(r"\bDipendente:\s*(\S+)", re.MULTILINE),
+    "Cognome": re.compile(r"\bDipendente:\s*\S+\s+(.+)$", re.MULTILINE),
+    "Data": re.compile(r"\bData:\s*(\d{4}-\d{2}-\d{2})", re.MULTILINE),
+    "Cluster": re.compile(r"\bOggetto:\s*(.+)$", re.MULTILINE),
+    "Country": re.compile(r"\bPaese:\s*(.+)$", re.MULTILINE),
+}
+
+
+class FakeBackendError(RuntimeError):
+    """Injected failure of a fake backend call."""
+
+
+class LatencyModel:
+    """
+    Log-normal latency around ``median_ms`` (+ ``per_unit_ms`` for each unit
+    of work, e.g. page) plus a Bernoulli error rate.
+    """
+
+    def __init__(
+        self,
+        median_ms: float,
+        sigma: float,
+        error_rate: float,
+        seed=None,
+        per_unit_ms: float = 0.0,
+    ):
+        self.median_ms = median_ms
+        self.per_unit_ms = per_unit_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def wait(self, what: str, units: int = 0):
+        with self._lock:
+            delay_ms = (
+                self.median_ms + self.per_unit_ms * units
+            ) * self._rng.lognormvariate(0.0, self.sigma)
+            failed = self._rng.random() < self.error_rate
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+        if failed:
+            raise FakeBackendError(f"Injected failure in fake {what}")
+
+
+def extract_pdf_text(data: bytes) -> str:
+    """Returns the text shown by the ``(...) Tj`` operators of a PDF."""
+    lines = []
+    for m in _TJ_RE.finditer(data):
+        raw = re.sub(rb"\\(.)", rb"\1", m.group(1))
+        lines.append(raw.decode("latin-1"))
+    return "\n".join(lines)
+
+
+class FakeStorage(StorageBackend):
+    def __init__(self, root: str, latency: LatencyModel):
+        self.root = root
+        self.latency = latency
+
+    def _path(self, bucket_name: str, blob_name: str = "") -> str:
+        return os.path.join(self.root, bucket_name, blob_name)
+
+    def list_blobs(self, bucket_name: str) -> list[str]:
+        self.latency.wait("storage.list_blobs")
+        base = self._path(bucket_name)
+        names = []
+        for dirpath, _, filenames in os.walk(base):
+            for f in filenames:
+                rel = os.path.relpath(os.path.join(dirpath, f), base)
+                names.append(rel.replace(os.sep, "/"))
+        return sorted(names)
+
+    def download(self, bucket_name: str, blob_name: str, file_path: str):
+        self.latency.wait("storage.download")
+        sh.copyfile(self._path(bucket_name, blob_name), file_path)
+
+    def upload(self, file_path: str, bucket_name: str, blob_name: str):
+        self.latency.wait("storage.upload")
+        dest = self._path(bucket_name, blob_name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        sh.copyfile(file_path, dest)
+
+
+class FakeOCR(OCRBackend):
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+
+    def _process(self, file_path: str) -> str:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        # Document AI time grows with the number of pages
+        self.latency.wait("ocr", units=len(_PAGE_RE.findall(data)))
+        return extract_pdf_text(data)
+
+
+class FakePart:
+    def __init__(self, data: bytes, mime_type: str):
+        self.data = data
+        self.mime_type = mime_type
+
+
+class FakeLLM(LLMBackend):
+    def __init__(self, latency: LatencyModel):
+        self.latency = latency
+
+    def _generate(self, contents) -> str:
+        self.latency.wait("llm")
+        text = "\n".join(
+            extract_pdf_text(c.data) if isinstance(c, FakePart) else str(c)
+            for c in contents
+        )
+        fields = {}
+        for key, pattern in _FIELD_RE.items():
+            m = pattern.search(text)
+            fields[key] = m.group(1).strip() if m else "ERRORE"
+        return json.dumps(fields, ensure_ascii=False)
+
+    def file_part(self, data: bytes, mime_type: str):
+        return FakePart(data, mime_type)
+
+    def with_system_instruction(self, instruction: str, *, cache: bool = True):
+        bound = FakeLLM(self.latency)
+        bound.system_instruction = instruction
+        bound.context_cached = cache
+        return bound
+
+
+def build_backends(config: dict) -> Backends:
+    sigma = float(config.get("FAKE_LATENCY_SIGMA") or 0.5)
+    error_rate = float(config.get("FAKE_ERROR_RATE") or 0.0)
+    seed = config.get("FAKE_SEED")
+
+    # Downloads re-raise on failure (see gcs_utils), so storage errors are
+    # opt-in through their own rate
+    storage_error_rate = float(config.get("FAKE_STORAGE_ERROR_RATE") or 0.0)
+
+    def latency(key: str, default_ms: float, rate: float = error_rate):
+        median_ms = float(config.get(key) or default_ms)
+        per_unit_ms = float(config.get(f"{key[:-3]}_PER_PAGE_MS") or 0.0)
+        return LatencyModel(median_ms, sigma, rate, seed, per_unit_ms)
+
+    return Backends(
+        storage=FakeStorage(
+            config.get("FAKE_ROOT") or "tmp/fake_gcs",
+            latency("FAKE_STORAGE_LATENCY_MS", 0, storage_error_rate),
+        ),
+        ocr=FakeOCR(latency("FAKE_OCR_LATENCY_MS", 0)),
+        llm=FakeLLM(latency("FAKE_LLM_LATENCY_MS", 0)),
+    )
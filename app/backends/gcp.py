@@ -0,0 +1,232 @@
+"""
+Google Cloud backends (GCS, Document AI, Gemini on Vertex AI).
+
+The Google SDKs take seconds to import, so each one is imported only when
+its backend first creates a client: a run that never calls Document AI
+never imports it. Credentials are resolved once per process and shared by
+every client; the lazy initialisers are locked, as the OCR/LLM workers
+(ocr/scheduler.py) may all make their first call at the same time.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from functools import lru_cache, wraps
+
+from backends.base import Backends, LLMBackend, OCRBackend, StorageBackend
+from utils.file_formatting import get_mime_type
+from utils.metrics import run_metrics
+
+logger = logging.getLogger(__name__)
+
+# Guards every lazy initialiser below (re-entrant: clients resolve the
+# credentials while holding it)
+_init_lock = threading.RLock()
+
+
+def _once(fn):
+    """``lru_cache(maxsize=1)`` whose first call runs once across threads."""
+    cached = lru_cache(maxsize=1)(fn)
+
+    @wraps(fn)
+    def wrapper():
+        with _init_lock:
+            return cached()
+
+    return wrapper
+
+
+@_once
+def _credentials():
+    """Application Default Credentials + project, resolved once."""
+    import google.auth
+
+    return google.auth.default(
+        scopes=["https://www.googleapis.com/auth/cloud-platform"]
+    )
+
+
+@_once
+def _init_vertexai():
+    import vertexai
+
+    credentials, _ = _credentials()
+    vertexai.init(credentials=credentials)
+
+
+class GCSStorage(StorageBackend):
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            with _init_lock:
+                if self._client is None:
+                    from google.cloud import storage
+
+                    credentials, project = _credentials()
+                    self._client = storage.Client(
+                        project=project, credentials=credentials
+                    )
+        return self._client
+
+    def list_blobs(self, bucket_name: str) -> list[str]:
+        return [b.name for b in self.client.bucket(bucket_name).list_blobs()]
+
+    def download(self, bucket_name: str, blob_name: str, file_path: str):
+        self.client.bucket(bucket_name).blob(blob_name).download_to_filename(file_path)
+
+    def upload(self, file_path: str, bucket_name: str, blob_name: str):
+        self.client.bucket(bucket_name).blob(blob_name).upload_from_filename(file_path)
+
+
+class DocumentAIOCR(OCRBackend):
+    def __init__(self, project_id: str, location: str, processor_id: str):
+        self.project_id = project_id
+        self.location = location
+        self.processor_id = processor_id
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            with _init_lock:
+                if self._client is None:
+                    from google.cloud import documentai_v1 as documentai
+
+                    credentials, _ = _credentials()
+                    self._client = documentai.DocumentProcessorServiceClient(
+                        credentials=credentials
+                    )
+        return self._client
+
+    def _process(self, file_path: str) -> str:
+        """Processes a document using Document AI."""
+        from google.cloud import documentai_v1 as documentai
+
+        processor_name = self.client.processor_path(
+            self.project_id, self.location, self.processor_id
+        )
+        # Read the file into memory
+        with open(file_path, "rb") as image_file:
+            image_content = image_file.read()
+
+        # Create a RawDocument object
+        raw_document = documentai.RawDocument(
+            content=image_content, mime_type=get_mime_type(file_path)
+        )
+
+        # Configure the ProcessRequest and call the Document AI API
+        request = documentai.ProcessRequest(
+            name=processor_name, raw_document=raw_document
+        )
+        document = self.client.process_document(request=request).document
+
+        # Example: Accessing entities (if your processor extracts them)
+        if document.entities:
+            print("Extracted Entities:")
+            for entity in document.entities:
+                print(f"  Type: {entity.type_}, Mention Text: {entity.mention_text}")
+
+        return document.text
+
+
+class GeminiLLM(LLMBackend):
+    def __init__(
+        self, model_name: str, cache_ttl_s: int = 3600, cache_min_tokens: int = 4096
+    ):
+        self.model_name = model_name
+        self.cache_ttl_s = cache_ttl_s
+        self.cache_min_tokens = cache_min_tokens
+        self._model = None
+        # (instruction, cache) -> (bound backend, monotonic expiry)
+        self._bound: dict[tuple[str, bool], tuple["GeminiLLM", float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with _init_lock:
+                if self._model is None:
+                    from vertexai.preview.generative_models import GenerativeModel
+
+                    _init_vertexai()
+                    self._model = GenerativeModel(
+                        self.model_name, system_instruction=self.system_instruction
+                    )
+        return self._model
+
+    def _generate(self, contents) -> str:
+        return self.model.generate_content(contents).text
+
+    def file_part(self, data: bytes, mime_type: str):
+        from vertexai.preview.generative_models import Part
+
+        return Part.from_data(data=data, mime_type=mime_type)
+
+    def with_system_instruction(self, instruction: str, *, cache: bool = True):
+        # Reuse the bound model (and its cached context) until shortly before
+        # the cache TTL expires
+        with self._lock:
+            bound, expires_at = self._bound.get((instruction, cache), (None, 0.0))
+            if bound is None or time.monotonic() >= expires_at:
+                bound = self._bind(instruction, cache)
+                expires_at = time.monotonic() + 0.9 * self.cache_ttl_s
+                self._bound[(instruction, cache)] = (bound, expires_at)
+            return bound
+
+    def _bind(self, instruction: str, cache: bool) -> "GeminiLLM":
+        bound = GeminiLLM(self.model_name, self.cache_ttl_s, self.cache_min_tokens)
+        bound.system_instruction = instruction
+        if not cache:
+            return bound
+        # ~4 characters per token: don't make a create call bound to fail
+        if len(instruction) / 4 < self.cache_min_tokens:
+            logger.info(
+                f"System instruction (~{len(instruction) // 4} tokens) below "
+                f"LLM_CACHE_MIN_TOKENS={self.cache_min_tokens}, sending inline"
+            )
+            return bound
+        try:
+            from vertexai.preview import caching
+            from vertexai.preview.generative_models import (
+                Content,
+                GenerativeModel,
+                Part,
+            )
+
+            _init_vertexai()
+            cached_content = caching.CachedContent.create(
+                model_name=self.model_name,
+                system_instruction=Content(
+                    role="system", parts=[Part.from_text(instruction)]
+                ),
+                ttl=timedelta(seconds=self.cache_ttl_s),
+            )
+            run_metrics.count_call("llm_cache_create")
+            bound._model = GenerativeModel.from_cached_content(cached_content)
+            bound.context_cached = True
+            logger.info(f"System instruction cached as {cached_content.name}")
+        except Exception as e:
+            # e.g. model without caching support or prefix below the minimum
+            # cacheable size: the instruction is sent with every request
+            logger.warning(f"Context caching unavailable ({e}), sending inline")
+        return bound
+
+
+def build_backends(config: dict) -> Backends:
+    return Backends(
+        storage=GCSStorage(),
+        ocr=DocumentAIOCR(
+            project_id=config["PROJECT_ID"],
+            location=config["LOCATION"],
+            processor_id=config["PROCESSOR_ID"],
+        ),
+        llm=GeminiLLM(
+            config["LLM_MODEL"],
+            cache_ttl_s=int(config.get("LLM_CACHE_TTL_S") or 3600),
+            cache_min_tokens=int(config.get("LLM_CACHE_MIN_TOKENS") or 4096),
+        ),
+    )
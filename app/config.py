@@ -18,4 +18,32 @@ def load_config():
         "TRAIN_GT_PATH": os.getenv("TRAIN_GT_PATH", "etl_db_data/doc_trains.csv"),
         "PERSONALE_PATH": os.getenv("PERSONALE_PATH", "etl_db_data/personale.csv"),
         "LLM_MODEL": os.getenv("LLM_MODEL", "gemini-2.5-pro"),
+        "LLM_CONTEXT_CACHE": os.getenv("LLM_CONTEXT_CACHE", "True"),
+        "LLM_CACHE_TTL_S": os.getenv("LLM_CACHE_TTL_S", "3600"),
+        # Smaller prompts are below the minimum size Vertex AI accepts for
+        # cached content: they are sent inline without trying
+        "LLM_CACHE_MIN_TOKENS": os.getenv("LLM_CACHE_MIN_TOKENS", "4096"),
+        "BACKEND": os.getenv("BACKEND", "gcp"),
+        "PIPELINE_MODE": os.getenv("PIPELINE_MODE", "overpowered"),
+        # Duplicate detection stages: exact,text or off (see ocr/dedup.py)
+        "DEDUP": os.getenv("DEDUP", "exact"),
+        "DEDUP_TEXT_THRESHOLD": os.getenv("DEDUP_TEXT_THRESHOLD", "0.9"),
+        # Concurrent OCR/LLM workers and oversized-document lane (ocr/scheduler.py)
+        "SCHED_WORKERS": os.getenv("SCHED_WORKERS", "4"),
+        "SCHED_OVERSIZED_WORKERS": os.getenv("SCHED_OVERSIZED_WORKERS", "1"),
+        "SCHED_OVERSIZED_PAGES": os.getenv("SCHED_OVERSIZED_PAGES", "30"),
+        # Only used by worker.py
+        "WORKER_MAX_BATCH": os.getenv("WORKER_MAX_BATCH", "16"),
+        "WORKER_MAX_LATENCY_S": os.getenv("WORKER_MAX_LATENCY_S", "2"),
+        "WORKER_FLUSH_INTERVAL_S": os.getenv("WORKER_FLUSH_INTERVAL_S", "300"),
+        # Only used with BACKEND=fake (see backends/fake.py)
+        "FAKE_ROOT": os.getenv("FAKE_ROOT", "tmp/fake_gcs"),
+        "FAKE_STORAGE_LATENCY_MS": os.getenv("FAKE_STORAGE_LATENCY_MS", "0"),
+        "FAKE_OCR_LATENCY_MS": os.getenv("FAKE_OCR_LATENCY_MS", "0"),
+        "FAKE_OCR_LATENCY_PER_PAGE_MS": os.getenv("FAKE_OCR_LATENCY_PER_PAGE_MS", "0"),
+        "FAKE_LLM_LATENCY_MS": os.getenv("FAKE_LLM_LATENCY_MS", "0"),
+        "FAKE_LATENCY_SIGMA": os.getenv("FAKE_LATENCY_SIGMA", "0.5"),
+        "FAKE_ERROR_RATE": os.getenv("FAKE_ERROR_RATE", "0"),
+        "FAKE_STORAGE_ERROR_RATE": os.getenv("FAKE_STORAGE_ERROR_RATE", "0"),
+        "FAKE_SEED": os.getenv("FAKE_SEED"),
     }
@@ -4,7 +4,9 @@ from pathlib import Path
 from typing import Union
 
 import pandas as pd
+from etl.registry import PersonnelRegistry, load_registry
 from utils.reading import read_csv_from_gcs
+from utils.tables import write_results
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,9 +28,9 @@ def clean_registry_df(
 
     # 1️⃣  normalise any variant of "ERRORE"
     df = df.applymap(
-        lambda x: "ERRORE"
-        if isinstance(x, str) and x.strip().upper() == "ERRORE"
-        else x
+        lambda x: (
+            "ERRORE" if isinstance(x, str) and x.strip().upper() == "ERRORE" else x
+        )
     )
 
     # 2️⃣  placeholders for key columns
@@ -71,7 +73,19 @@ def clean_registry_df(
     return df
 
 
-def combine_clean_data(df_results, df_personale):
+def _column(df: pd.DataFrame, name: str, default) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def combine_clean_data(df_results, registry):
+    """
+    Builds the two sections of the .dat from the cleaned results.
+
+    ``registry`` is the compiled PersonnelRegistry (see etl/registry.py); a
+    personale DataFrame is still accepted and compiled on the fly.
+    """
     cols_section_1 = [
         "FILENAME",
         "METADATA",
@@ -86,8 +100,6 @@ def combine_clean_data(df_results, df_personale):
         "SourceSystemOwner",
         "SourceSystemId",
     ]
-    df_section_1 = pd.DataFrame(columns=cols_section_1)
-
     cols_section_2 = [
         "FILENAME",
         "METADATA",
@@ -103,93 +115,87 @@ def combine_clean_data(df_results, df_personale):
         "SourceSystemOwner",
         "SourceSystemId",
     ]
-    df_section_2 = pd.DataFrame(columns=cols_section_2)
-
-    for _, row_results in df_results.iterrows():
-        # 1. Cerchiamo il match e dividiamo in due casi: match o non match
-        # Per cercare il match, cerchiamo il match tra Nome e Cognome in df_personale. Se non c'è, allora è una riga speciale.
-        # Riga speciale costruita con valori specifici e altri no.
-        # 2. Se match, aggiungiamo i dati in df_section_1 i dati.
-        match = False
-        for _, row_personale in df_personale.iterrows():
-            nome_pers = row_personale.get("Nome", "NONAME").strip().upper()
-            cognome_pers = row_personale.get("Cognome", "NOLASTNAME").strip().upper()
-
-            nome_res = row_results.get("Nome", "NONAME").strip().upper()
-            cognome_res = row_results.get("Cognome", "NOLASTNAME").strip().upper()
-            data_res = row_results.get("Data", "NODATE")
-
-            if (
-                nome_res == nome_pers
-                and cognome_res == cognome_pers
-                and data_res != "NODATE"
-            ):
-                # match
-                match = True
-                person_number = row_personale["Person Number"]
-                document_type = row_results.get("Cluster", "Nessun cluster")
-                country = row_results.get("Country", "")
-                document_name = f"{cognome_res} {nome_res}".strip().upper()
-
-        if not match:
-            # non match
-            person_number = "Nessun dipendente"
-            document_type = "SCARTATO"
-            country = ""
-            document_name = "Nessun dipendente"
-            document_code = "Nessun dipendente"
-
-        # aggiungiamo i dati in comune per match e non match
-        file_name = row_results["File_Name"]
-        metadata = "MERGE"
-        documents_of_records = "DocumentsOfRecords"
-        date_from = row_results["Data"]
-        date_normalized = date_from.replace("/", "").strip()
-        document_code = f"{person_number}_{date_normalized}_{document_type}"
-        date_to = ""
-        source_system_owner = "PEOPLE"
-        source_system_id = document_code
-        document_attachment = "DocumentAttachment"
-
-        # aggiungiamo i dati per la sezione 1
-        # non usare append
-        df_section_1.loc[len(df_section_1)] = [
-            file_name,
-            metadata,
-            documents_of_records,
-            person_number,
-            document_type,
-            country,
-            document_code,
-            document_name,
-            date_from,
-            date_to,
-            source_system_owner,
-            source_system_id,
-        ]
-
-        # salviamo la riga per il df_section_2
-
-        data_type_code = "FILE"
-        url_or_text_or_file_name = file_name
-        title = file_name
-        file = file_name
-
-        df_section_2.loc[len(df_section_2)] = [
-            file_name,
-            metadata,
-            document_attachment,
-            person_number,
-            document_type,
-            country,
-            document_code,
-            data_type_code,
-            url_or_text_or_file_name,
-            title,
-            file,
-            source_system_owner,
-            source_system_id,
-        ]
+    # empty bucket, or a batch whose documents all failed
+    if df_results.empty:
+        return pd.DataFrame(columns=cols_section_1), pd.DataFrame(
+            columns=cols_section_2
+        )
+
+    if isinstance(registry, pd.DataFrame):
+        registry = PersonnelRegistry.from_frame(registry)
+
+    # 1. Cerchiamo il match tra Nome e Cognome nel registro: una lookup per
+    # riga, i nomi del registro sono già normalizzati. Se non c'è (o manca la
+    # data), allora è una riga speciale.
+    nome_res = _column(df_results, "Nome", "NONAME").astype(str).str.strip().str.upper()
+    cognome_res = (
+        _column(df_results, "Cognome", "NOLASTNAME").astype(str).str.strip().str.upper()
+    )
+    data_res = _column(df_results, "Data", "NODATE")
+    person_number = registry.lookup(nome_res + "|" + cognome_res)
+    match = person_number.notna() & (data_res != "NODATE")
+
+    # 2. Se match, usiamo i dati del documento; altrimenti la riga speciale
+    person_number = person_number.where(match, "Nessun dipendente")
+    document_type = _column(df_results, "Cluster", "Nessun cluster").where(
+        match, "SCARTATO"
+    )
+    country = _column(df_results, "Country", "").where(match, "")
+    document_name = (
+        (cognome_res + " " + nome_res)
+        .str.strip()
+        .str.upper()
+        .where(match, "Nessun dipendente")
+    )
+
+    # dati in comune per match e non match
+    file_name = df_results["File_Name"]
+    date_from = df_results["Data"]
+    date_normalized = date_from.astype(str).str.replace("/", "").str.strip()
+    document_code = (
+        person_number.astype(str)
+        + "_"
+        + date_normalized
+        + "_"
+        + document_type.astype(str)
+    )
+
+    df_section_1 = pd.DataFrame(
+        {
+            "FILENAME": file_name,
+            "METADATA": "MERGE",
+            "DocumentsOfRecord": "DocumentsOfRecords",
+            "PersonNumber": person_number,
+            "DocumentType": document_type,
+            "Country": country,
+            "DocumentCode": document_code,
+            "DocumentName": document_name,
+            "DateFrom": date_from,
+            "DateTo": "",
+            "SourceSystemOwner": "PEOPLE",
+            "SourceSystemId": document_code,
+        },
+        columns=cols_section_1,
+    ).reset_index(drop=True)
+
+    df_section_2 = pd.DataFrame(
+        {
+            "FILENAME": file_name,
+            "METADATA": "MERGE",
+            "DocumentAttachment": "DocumentAttachment",
+            "PersonNumber": person_number,
+            "DocumentType": document_type,
+            "Country": country,
+            "DocumentCode": document_code,
+            "DataTypeCode": "FILE",
+            "URLorTextorFileName": file_name,
+            "Title": file_name,
+            "File": file_name,
+            "SourceSystemOwner": "PEOPLE",
+            "SourceSystemId": document_code,
+        },
+        columns=cols_section_2,
+    ).reset_index(drop=True)
 
     return df_section_1, df_section_2
 
@@ -204,28 +210,35 @@ def build_csv_string(df_sec_1: pd.DataFrame, df_sec_2: pd.DataFrame, sep="|") ->
     return csv1 + csv2
 
 
-def run_etl(df_results, config, eval=False):
+def run_etl(df_results, config, eval=False, df_personale=None):
     """
     Legacy function for backward compatibility.
     Now uses the new build_final_csv function.
+
+    The personnel registry is compiled from PERSONALE_PATH once and shared
+    by every call in the process (see etl/registry.py); ``df_personale``
+    overrides it with an already loaded table.
     """
-    # Save the extracted results to a temporary CSV
+    # Save the extracted results (typed Parquet, see utils/tables.py)
     os.makedirs("tmp/processed/", exist_ok=True)
-    temp_extracted_path = "tmp/processed/ocr_extracted_results.csv"
-    df_results.to_csv(temp_extracted_path, index=False)
+    temp_extracted_path = "tmp/processed/ocr_extracted_results.parquet"
+    write_results(df_results, temp_extracted_path)
 
     # Get the paths for the reference files
     personale_path = config["PERSONALE_PATH"]
     cluster_path = config["CLUSTERS_PATH"]
     # train_gt_path = config["TRAIN_GT_PATH"]
 
-    df_personale = pd.read_csv(personale_path)
+    if df_personale is None:
+        registry = load_registry(personale_path)
+    else:
+        registry = PersonnelRegistry.from_frame(df_personale)
 
     # clean the df_results
     df_results = clean_registry_df(df_results)
 
     # combine the data
-    df_sec_1, df_sec_2 = combine_clean_data(df_results, df_personale)
+    df_sec_1, df_sec_2 = combine_clean_data(df_results, registry)
 
     # build the csv string
     csv_string = build_csv_string(df_sec_1, df_sec_2)
@@ -0,0 +1,104 @@
+"""
+Personnel registry index used by the ETL to resolve extracted names.
+
+The registry (PERSONALE_PATH) is compiled once into a map from normalized
+name key to Person Number, and the map is reused at three levels:
+
+- in-process: shared by every ``run_etl`` call (worker flushes, repeated
+  runs in the same interpreter);
+- on disk: pickled in ``tmp/cache/`` next to the Parquet copies, so a new
+  process loads the map instead of rebuilding it;
+- both are keyed on the source fingerprint (mtime/size, or the object
+  generation on GCS), so an updated registry is picked up on the next run.
+"""
+
+import logging
+import os
+import pickle
+import threading
+from dataclasses import dataclass, field
+
+import pandas as pd
+from utils.tables import cache_path, read_personale, source_fingerprint
+
+logger = logging.getLogger(__name__)
+
+_registries: dict[str, "PersonnelRegistry"] = {}
+_lock = threading.Lock()
+
+
+def name_keys(nome: pd.Series, cognome: pd.Series) -> pd.Series:
+    """Normalized ``NOME|COGNOME`` keys, as matched against the registry."""
+    return (
+        nome.astype(str).str.strip().str.upper()
+        + "|"
+        + cognome.astype(str).str.strip().str.upper()
+    )
+
+
+@dataclass
+class PersonnelRegistry:
+    # name key -> Person Number
+    by_name: dict[str, str]
+    # name keys shared by several employees -> all their Person Numbers
+    duplicates: dict[str, list[str]] = field(default_factory=dict)
+    fingerprint: str | None = None
+
+    @classmethod
+    def from_frame(
+        cls, df_personale: pd.DataFrame, fingerprint: str | None = None
+    ) -> "PersonnelRegistry":
+        keys = name_keys(df_personale["Nome"], df_personale["Cognome"])
+        numbers = df_personale["Person Number"].astype(str)
+        # the last row wins for homonyms, as the row-by-row match used to do
+        by_name = dict(zip(keys, numbers))
+        duplicates = {}
+        dup_mask = keys.duplicated(keep=False)
+        if dup_mask.any():
+            duplicates = numbers[dup_mask].groupby(keys[dup_mask]).agg(list).to_dict()
+        return cls(by_name, duplicates, fingerprint)
+
+    def lookup(self, keys: pd.Series) -> pd.Series:
+        """Person Number for each key, NaN when the name is not registered."""
+        return keys.map(self.by_name)
+
+    def __len__(self):
+        return len(self.by_name)
+
+
+def _build(path: str, fingerprint: str) -> PersonnelRegistry:
+    pickle_path = cache_path(path, ".registry.pickle")
+    try:
+        with open(pickle_path, "rb") as f:
+            registry = pickle.load(f)
+        if registry.fingerprint == fingerprint:
+            return registry
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    registry = PersonnelRegistry.from_frame(read_personale(path), fingerprint)
+    if registry.duplicates:
+        logger.warning(
+            f"{len(registry.duplicates)} names in {path} belong to more than "
+            f"one Person Number, the last one is used: "
+            f"{list(registry.duplicates)[:10]}"
+        )
+    os.makedirs(os.path.dirname(pickle_path), exist_ok=True)
+    tmp = f"{pickle_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(registry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, pickle_path)
+    return registry
+
+
+def load_registry(path: str) -> PersonnelRegistry:
+    """
+    Returns the compiled registry of ``path``: from memory, from the on-disk
+    cache, or rebuilt from the source when it changed.
+    """
+    fingerprint = source_fingerprint(path)
+    with _lock:
+        registry = _registries.get(path)
+        if registry is None or registry.fingerprint != fingerprint:
+            registry = _registries[path] = _build(path, fingerprint)
+        return registry
@@ -0,0 +1,234 @@
+"""
+Scores a DocumentsOfRecord.dat against the doc_trains.csv ground truth.
+
+Vectorized replacement of the matching logic in ``notebooks/eval.ipynb``:
+the .dat is streamed in chunks keeping only the scored columns, the
+normalization runs on whole columns and the join with the ground truth is
+a single merge, so million-row outputs are scored in seconds.
+
+The report (per-field and per-cluster accuracy) is written next to the
+run's ``run_metrics.json`` and embeds it, so accuracy can be weighed
+against latency and API calls.
+
+Usage:
+    python evaluation.py --dat tmp/processed/DocumentsOfRecord.dat \\
+        --gt etl_db_data/doc_trains.csv
+"""
+
+import argparse
+import json
+import mmap
+import os
+import time
+
+import pandas as pd
+
+DOR_HEADER = b"FILENAME|METADATA|DocumentsOfRecord|"
+SECTION_HEADER = b"\nFILENAME|METADATA|"
+DAT_COLUMNS = ["FILENAME", "DocumentType", "DocumentName", "DateFrom"]
+FIELDS = ["name", "date", "cluster"]
+
+
+def _on_uniques(s: pd.Series, fn) -> pd.Series:
+    """
+    Applies a column transform to the distinct values only and broadcasts the
+    result back: names, dates and clusters repeat a lot across a big .dat.
+    """
+    codes, uniques = pd.factorize(s.fillna("").astype(str))
+    mapped = fn(pd.Series(uniques, dtype=object)).to_numpy()
+    return pd.Series(mapped[codes], index=s.index)
+
+
+def _normalize_names(s: pd.Series) -> pd.Series:
+    """Upper-case, collapse whitespace; 'Nessun dipendente' is kept as is."""
+    return _on_uniques(
+        s, lambda u: u.str.replace(r"\s+", " ", regex=True).str.strip().str.upper()
+    )
+
+
+def _parse_dates(u: pd.Series) -> pd.Series:
+    out = pd.to_datetime(u.str.strip(), format="%Y/%m/%d", errors="coerce")
+    for fmt in ("%d/%m/%Y", "%Y-%m-%d"):
+        missing = out.isna()
+        if not missing.any():
+            break
+        out[missing] = pd.to_datetime(
+            u[missing].str.strip(), format=fmt, errors="coerce"
+        )
+    return out
+
+
+def _normalize_dates(s: pd.Series) -> pd.Series:
+    """
+    DD/MM/YYYY, YYYY/MM/DD and YYYY-MM-DD → datetime64; NaT if unparsable,
+    so that missing dates never count as a match.
+    """
+    return _on_uniques(s, _parse_dates).astype("datetime64[ns]")
+
+
+def _documents_of_record_rows(dat_path: str) -> int:
+    """Counts the data lines of the DocumentsOfRecord section of a .dat."""
+    with open(dat_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if not mm[: len(DOR_HEADER)] == DOR_HEADER:
+                raise ValueError(
+                    f"{dat_path} does not start with a DocumentsOfRecord header"
+                )
+            end = mm.find(SECTION_HEADER)
+            end = len(mm) if end == -1 else end + 1
+            # every line up to the next section header, minus the header itself
+            n_lines = mm[:end].count(b"\n")
+            if end == len(mm) and not mm[-1:] == b"\n":
+                n_lines += 1
+            return n_lines - 1
+
+
+def read_dat_file(dat_path: str, chunksize: int = 250_000) -> pd.DataFrame:
+    """
+    Streams the DocumentsOfRecord section of a .dat keeping only the scored
+    columns, already normalized. One row per file name (first occurrence).
+    """
+    n_rows = _documents_of_record_rows(dat_path)
+    chunks = []
+    reader = pd.read_csv(
+        dat_path,
+        sep="|",
+        usecols=DAT_COLUMNS,
+        dtype=str,
+        keep_default_na=False,
+        nrows=n_rows,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        chunks.append(
+            pd.DataFrame(
+                {
+                    "key": chunk["FILENAME"].str.strip().str.lower(),
+                    "pred_name": _normalize_names(chunk["DocumentName"]),
+                    "pred_date": _normalize_dates(chunk["DateFrom"]),
+                    "pred_cluster": _normalize_names(chunk["DocumentType"]),
+                }
+            )
+        )
+    if not chunks:
+        return pd.DataFrame(columns=["key", "pred_name", "pred_date", "pred_cluster"])
+    df = pd.concat(chunks, ignore_index=True)
+    return df.drop_duplicates("key", keep="first")
+
+
+def read_ground_truth(gt_path: str) -> pd.DataFrame:
+    """Reads doc_trains (.csv, tab- or comma-separated, or .xlsx)."""
+    if gt_path.lower().endswith((".xlsx", ".xls")):
+        df = pd.read_excel(gt_path, dtype=str)
+    else:
+        with open(gt_path, encoding="utf-8") as f:
+            sep = "\t" if "\t" in f.readline() else ","
+        df = pd.read_csv(gt_path, sep=sep, dtype=str, keep_default_na=False)
+    return pd.DataFrame(
+        {
+            "file_name": df["Nome file"],
+            "key": df["Nome file"].str.strip().str.lower(),
+            "gt_name": _normalize_names(df["Nominativo"]),
+            "gt_date": _normalize_dates(df["Data"]),
+            "gt_cluster": _normalize_names(df["Cluster"]),
+            "Cluster": df["Cluster"],
+        }
+    )
+
+
+def compare(df_dat: pd.DataFrame, df_gt: pd.DataFrame) -> pd.DataFrame:
+    """One row per ground-truth document with a boolean column per field."""
+    df = df_gt.merge(df_dat, on="key", how="left", indicator=True)
+    out = pd.DataFrame({"file_name": df["file_name"], "Cluster": df["Cluster"]})
+    out["found"] = df["_merge"].eq("both").to_numpy()
+    for field in FIELDS:
+        out[field] = (df[f"gt_{field}"] == df[f"pred_{field}"]).to_numpy()
+    out["full"] = out[FIELDS].all(axis=1)
+    return out
+
+
+def evaluate(
+    dat_path: str,
+    gt_path: str,
+    *,
+    metrics_path: str | None = None,
+    chunksize: int = 250_000,
+) -> dict:
+    """Returns per-field and per-cluster accuracy, plus the run metrics if any."""
+    start = time.perf_counter()
+    comparison = compare(read_dat_file(dat_path, chunksize), read_ground_truth(gt_path))
+    score_cols = ["found", *FIELDS, "full"]
+
+    per_cluster = comparison.groupby("Cluster")[score_cols].mean().round(4)
+    per_cluster.insert(0, "documents", comparison.groupby("Cluster").size())
+    report = {
+        "dat_path": os.path.abspath(dat_path),
+        "gt_path": os.path.abspath(gt_path),
+        "documents": len(comparison),
+        "found": int(comparison["found"].sum()),
+        "accuracy": comparison[score_cols].mean().round(4).to_dict(),
+        "per_cluster": per_cluster.to_dict(orient="index"),
+    }
+    report["eval_seconds"] = round(time.perf_counter() - start, 4)
+
+    metrics_path = metrics_path or os.path.join(
+        os.path.dirname(os.path.abspath(dat_path)), "run_metrics.json"
+    )
+    if os.path.exists(metrics_path):
+        with open(metrics_path, encoding="utf-8") as f:
+            report["run_metrics"] = json.load(f)
+    return report
+
+
+def write_report(report: dict, path: str | None = None) -> str:
+    """Writes the report next to the evaluated .dat (eval_report.json)."""
+    path = path or os.path.join(os.path.dirname(report["dat_path"]), "eval_report.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def print_report(report: dict):
+    acc = report["accuracy"]
+    print("=== EVALUATION SUMMARY ===")
+    print(f"Documents in ground truth: {report['documents']}")
+    print(f"Found in .dat: {report['found']} ({acc['found']:.2%})")
+    for field in [*FIELDS, "full"]:
+        print(f"  {field:<8} {acc[field]:.2%}")
+    print()
+    print(f"{'Cluster':<32} {'docs':>7} {'name':>7} {'date':>7} {'cluster':>8}")
+    for cluster, row in report["per_cluster"].items():
+        print(
+            f"{cluster[:32]:<32} {row['documents']:>7} {row['name']:>7.2%} "
+            f"{row['date']:>7.2%} {row['cluster']:>8.2%}"
+        )
+    metrics = report.get("run_metrics")
+    if metrics:
+        print()
+        print(
+            f"Run: {metrics.get('pipeline_mode', '?')} | "
+            f"{metrics['throughput_docs_per_s']} docs/s | "
+            f"p95 {metrics['latency_p95_s']} s | API calls {metrics['api_calls']}"
+        )
+    print(f"\nScored in {report['eval_seconds']} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dat", default="tmp/processed/DocumentsOfRecord.dat")
+    parser.add_argument("--gt", default=None, help="Defaults to TRAIN_GT_PATH")
+    parser.add_argument("--metrics", default=None, help="run_metrics.json to embed")
+    parser.add_argument("--output", default=None, help="Report path")
+    parser.add_argument("--chunksize", type=int, default=250_000)
+    args = parser.parse_args()
+
+    if args.gt is None:
+        from config import load_config
+
+        args.gt = load_config()["TRAIN_GT_PATH"]
+
+    report = evaluate(
+        args.dat, args.gt, metrics_path=args.metrics, chunksize=args.chunksize
+    )
+    print_report(report)
+    print(f"Report written to {write_report(report, args.output)}")
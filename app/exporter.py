@@ -4,7 +4,7 @@ import zipfile
 from pathlib import Path
 from typing import Dict, Optional
 
-from google.cloud import storage
+from backends import get_backends
 
 _DOC_EXT = {".pdf", ".tif", ".tiff", ".png", ".jpg", ".jpeg"}
 
@@ -67,12 +67,11 @@ def zip_and_upload(
     )
 
     # 2) upload
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(output_bucket_name)
-    blob = bucket.blob(f"{run_id}/{Path(zip_path).name}")
+    storage = get_backends(config).storage
+    blob_name = f"{run_id}/{Path(zip_path).name}"
 
     print(f"Caricamento di '{zip_path}' su gs://{output_bucket_name}/{run_id}/")
-    blob.upload_from_filename(zip_path)
+    storage.upload(zip_path, output_bucket_name, blob_name)
     print("Caricamento completato ✔️")
 
     return f"gs://{output_bucket_name}/{run_id}/{Path(zip_path).name}"
@@ -1,7 +1,8 @@
 import logging
 import os
 
-from google.cloud import storage
+from backends import get_backends
+from config import load_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -12,8 +13,8 @@ GCS_DATA_PREFIX = "data/"
 
 def download_from_bucket(config: dict) -> list[str]:
     """Downloads files from a GCS bucket to a local directory."""
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(config["INPUT_BUCKET"])
+    storage = get_backends(config).storage
+    bucket_name = config["INPUT_BUCKET"]
 
     local_tmp_dir = "tmp/"
     os.makedirs(local_tmp_dir, exist_ok=True)
@@ -26,23 +27,23 @@ def download_from_bucket(config: dict) -> list[str]:
 
     downloaded_files = []
     exts = (".pdf", ".tif", ".tiff", ".png", ".jpeg", ".jpg")
-    blobs = [b for b in bucket.list_blobs() if b.name.lower().endswith(exts)]
+    blobs = [b for b in storage.list_blobs(bucket_name) if b.lower().endswith(exts)]
 
     logger.info(f"Found {len(blobs)} files in bucket with extensions {exts}")
 
-    for blob in blobs:
+    for blob_name in blobs:
         # --- IMPORTANT: Skip blobs that are GCS directory markers ---
-        if blob.name.endswith("/"):
-            logger.info(f"Skipping directory marker: {blob.name}")
+        if blob_name.endswith("/"):
+            logger.info(f"Skipping directory marker: {blob_name}")
             continue
 
-        file_path = os.path.join(local_tmp_dir, os.path.basename(blob.name))
+        file_path = os.path.join(local_tmp_dir, os.path.basename(blob_name))
         try:
-            blob.download_to_filename(file_path)
+            storage.download(bucket_name, blob_name, file_path)
             downloaded_files.append(file_path)
-            logger.info(f"Downloaded {blob.name} to {file_path}")
+            logger.info(f"Downloaded {blob_name} to {file_path}")
         except Exception as e:
-            logger.error(f"Error downloading {blob.name} to {file_path}: {e}")
+            logger.error(f"Error downloading {blob_name} to {file_path}: {e}")
             # Depending on your needs, you might want to:
             # - continue (skip to next blob)
             # - raise (stop execution)
@@ -53,12 +54,21 @@ def download_from_bucket(config: dict) -> list[str]:
     return downloaded_files
 
 
-def upload_to_bucket(file_path: str, bucket_name: str):
-    """Uploads a file to a GCS bucket."""
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(bucket_name)
-    blob = bucket.blob(os.path.basename(file_path))
+def download_blob(
+    config: dict, bucket_name: str, blob_name: str, local_dir: str
+) -> str:
+    """Downloads a single object to ``local_dir`` and returns its local path."""
+    os.makedirs(local_dir, exist_ok=True)
+    file_path = os.path.join(local_dir, os.path.basename(blob_name))
+    get_backends(config).storage.download(bucket_name, blob_name, file_path)
+    logger.info(f"Downloaded {blob_name} to {file_path}")
+    return file_path
+
+
+def upload_to_bucket(file_path: str, bucket_name: str, config: dict | None = None):
+    """Uploads a file to a GCS bucket (with the environment config by default)."""
+    storage = get_backends(config if config is not None else load_config()).storage
 
     logger.info(f"Uploading {file_path} to gs://{bucket_name}...")
-    blob.upload_from_filename(file_path)
+    storage.upload(file_path, bucket_name, os.path.basename(file_path))
     logger.info("Upload complete.")
@@ -0,0 +1,301 @@
+"""
+Duplicate detection ahead of OCR/LLM.
+
+Input buckets often contain the same letter twice: re-uploaded under another
+name, re-exported in another format or scanned again. Only one document of
+each group (the *representative*) goes through OCR and the LLM; the others
+inherit its extracted fields and keep their own ``File_Name`` row.
+
+Stages, selected by ``config["DEDUP"]`` (comma separated):
+
+- ``exact``: identical bytes (SHA-256), before OCR.
+- ``text``: MinHash over word shingles of the OCR text, before the LLM.
+  Candidates are verified on the exact Jaccard similarity, must contain the
+  same numbers (dates, employee ids) and the same words up to OCR
+  confusions (``0``/``o``, ``rn``/``m``, ...): a form letter sent to two
+  employees differs only in the name and must not be merged. Opt-in.
+
+Near-duplicate lookups go through LSH band indexes, so they stay sub-linear
+in the number of documents seen.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from utils.metrics import run_metrics
+
+logger = logging.getLogger(__name__)
+
+DEDUP_STAGES = ("exact", "text")
+# Fields of a duplicate whose representative produced no result
+ERROR_FIELDS = {k: "ERRORE" for k in ("Nome", "Cognome", "Data", "Cluster", "Country")}
+
+# MinHash: NUM_PERM = BANDS * ROWS. With 16 bands of 8 rows a pair with
+# Jaccard 0.9 is a candidate with probability > 0.99
+_NUM_PERM = 128
+_BANDS = 16
+_SHINGLE_WORDS = 5
+_MERSENNE_PRIME = (1 << 61) - 1
+_WORD_RE = re.compile(r"\w+")
+_NUMBER_RE = re.compile(r"\d+")
+# OCR confusions folded before comparing the words of two texts
+_OCR_DIGRAPHS = (("rn", "m"), ("vv", "w"), ("cl", "d"))
+_OCR_CHARS = str.maketrans("0158i", "olsbl")
+
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def shingles(text: str, k: int = _SHINGLE_WORDS) -> set[int]:
+    """Hashed k-word shingles of the lowercased text."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i : i + k]).encode())
+        for i in range(len(words) - k + 1)
+    }
+
+
+def ocr_words(text: str) -> frozenset[str]:
+    """
+    Words of the text with common OCR confusions folded, so a re-scan reads
+    the same; single characters (specks, stray marks) are left out.
+    """
+    words = set()
+    for word in _WORD_RE.findall(text.lower()):
+        if len(word) < 2:
+            continue
+        for a, b in _OCR_DIGRAPHS:
+            word = word.replace(a, b)
+        words.add(word.translate(_OCR_CHARS))
+    return frozenset(words)
+
+
+class MinHasher:
+    """MinHash signatures with ``num_perm`` universal hash functions."""
+
+    def __init__(self, num_perm: int = _NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b < 2**32 and 32-bit shingle hashes: a * x + b fits in uint64
+        self.a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: set[int]) -> np.ndarray:
+        x = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[:, None]
+        return ((x * self.a + self.b) % _MERSENNE_PRIME).min(axis=0)
+
+
+class LSHIndex:
+    """
+    Banded LSH index: items sharing at least one band of their signature are
+    candidates. Lookups cost one dict access per band.
+    """
+
+    def __init__(self, bands: int):
+        self.bands = bands
+        self.buckets: list[dict] = [defaultdict(list) for _ in range(bands)]
+
+    def _keys(self, signature: np.ndarray) -> list[bytes]:
+        return [band.tobytes() for band in np.array_split(signature, self.bands)]
+
+    def candidates(self, signature) -> list[str]:
+        seen = {}
+        for bucket, key in zip(self.buckets, self._keys(signature)):
+            for item in bucket.get(key, ()):
+                seen.setdefault(item, None)
+        return list(seen)
+
+    def add(self, item: str, signature):
+        for bucket, key in zip(self.buckets, self._keys(signature)):
+            bucket[key].append(item)
+
+
+class Deduplicator:
+    """
+    Groups duplicate documents and maps each one to its representative.
+
+    ``filter_files`` (before OCR) and ``filter_texts`` (before the LLM) drop
+    the duplicates from the work list, ``expand`` adds their rows back to the
+    results. The indexes persist across calls, so a long-running worker can
+    reuse one instance for a whole flush window.
+    """
+
+    def __init__(
+        self,
+        stages=("exact",),
+        text_threshold: float = 0.9,
+    ):
+        unknown = set(stages) - set(DEDUP_STAGES)
+        if unknown:
+            raise ValueError(
+                f"Unknown DEDUP stage(s) {sorted(unknown)}, expected {DEDUP_STAGES}"
+            )
+        self.stages = set(stages)
+        self.text_threshold = text_threshold
+
+        self.representative: dict[str, str] = {}  # duplicate -> representative
+        self.stage: dict[str, str] = {}  # duplicate -> stage that found it
+        self._by_sha: dict[str, str] = {}
+        self._minhasher = MinHasher()
+        self._shingles: dict[str, set[int]] = {}
+        self._numbers: dict[str, frozenset[str]] = {}
+        self._words: dict[str, frozenset[str]] = {}
+        self._text_index = LSHIndex(bands=_BANDS)
+        self._rows: dict[str, dict] = {}
+        # is_text_duplicate is called by concurrent OCR/LLM workers
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Deduplicator":
+        stages = [
+            s.strip().lower()
+            for s in str(config.get("DEDUP", "exact")).split(",")
+            if s.strip() and s.strip().lower() not in ("off", "none", "false")
+        ]
+        return cls(
+            stages,
+            text_threshold=float(config.get("DEDUP_TEXT_THRESHOLD") or 0.9),
+        )
+
+    def _mark(self, filename: str, representative: str, stage: str):
+        self.representative[filename] = representative
+        self.stage[filename] = stage
+        run_metrics.count_usage(f"dedup_{stage}", 1)
+        logger.info(f"{filename} is a duplicate ({stage}) of {representative}")
+
+    # -- before OCR ---------------------------------------------------------
+
+    def filter_files(self, folder: str, files: list[str]) -> list[str]:
+        """Returns the files of ``folder`` that still need OCR/LLM."""
+        if "exact" not in self.stages:
+            return files
+        unique = []
+        for filename in files:
+            path = os.path.join(folder, filename)
+            start = time.perf_counter()
+            try:
+                if self._exact(filename, path):
+                    continue
+            except Exception as e:
+                logger.warning(f"Dedup skipped for {filename}: {e}")
+            finally:
+                run_metrics.add_document_time(filename, time.perf_counter() - start)
+            unique.append(filename)
+        return unique
+
+    def _exact(self, filename: str, path: str) -> bool:
+        digest = _sha256(path)
+        # the same file seen again (e.g. a redelivered notification) is not
+        # a duplicate of itself
+        if self._by_sha.get(digest, filename) != filename:
+            self._mark(filename, self._by_sha[digest], "exact")
+            return True
+        self._by_sha[digest] = filename
+        return False
+
+    # -- before the LLM -----------------------------------------------------
+
+    def filter_texts(self, docs: list, skip: str | None = None) -> list:
+        """
+        Returns the ``(filename, text)`` documents that still need the LLM.
+        Documents whose text is ``skip`` (failed OCR) are never merged.
+        """
+        if "text" not in self.stages:
+            return docs
+        return [doc for doc in docs if not self.is_text_duplicate(doc[0], doc[1], skip)]
+
+    def is_text_duplicate(self, filename: str, text, skip: str | None = None) -> bool:
+        """Checks one OCR text and indexes it when it is not a duplicate."""
+        text = str(text)
+        if "text" not in self.stages or text == skip:
+            return False
+        with self._lock:
+            return self._text(filename, text)
+
+    def _text(self, filename: str, text: str) -> bool:
+        hashes = shingles(text)
+        if not hashes:
+            return False
+        numbers = frozenset(_NUMBER_RE.findall(text))
+        words = ocr_words(text)
+        signature = self._minhasher.signature(hashes)
+        for other in self._text_index.candidates(signature):
+            if other == filename or self._numbers[other] != numbers:
+                continue
+            other_hashes = self._shingles[other]
+            jaccard = len(hashes & other_hashes) / len(hashes | other_hashes)
+            # similar is not enough: a word found in only one of the texts
+            # (e.g. the addressee's name) makes them different documents
+            if jaccard >= self.text_threshold and self._words[other] == words:
+                self._mark(filename, other, "text")
+                return True
+        self._shingles[filename] = hashes
+        self._numbers[filename] = numbers
+        self._words[filename] = words
+        self._text_index.add(filename, signature)
+        return False
+
+    # -- after the LLM ------------------------------------------------------
+
+    def expand(
+        self, df: pd.DataFrame, files: list[str] | None = None, ocr: bool = True
+    ) -> pd.DataFrame:
+        """
+        Adds a row to ``df`` for every duplicate (of ``files`` if given),
+        copied from its representative's row with its own ``File_Name``, and
+        counts the calls it saved (the OCR call too for ``exact`` duplicates
+        when ``ocr``).
+
+        A duplicate whose representative has no row (its processing failed)
+        gets a row with ERRORE fields and saves nothing.
+        """
+        if not df.empty:
+            for row in df.to_dict("records"):
+                self._rows[row["File_Name"]] = row
+        wanted = None if files is None else set(files)
+        rows, orphans = [], []
+        for filename, representative in self.representative.items():
+            if filename in self._rows or (
+                wanted is not None and filename not in wanted
+            ):
+                continue
+            # a file can duplicate (text) a file that had exact copies itself;
+            # stop on a loop rather than spin
+            seen = {filename}
+            while representative in self.representative and representative not in seen:
+                seen.add(representative)
+                representative = self.representative[representative]
+            if representative in self._rows:
+                rows.append({**self._rows[representative], "File_Name": filename})
+                run_metrics.count_saved("llm")
+                if ocr and self.stage[filename] != "text":
+                    run_metrics.count_saved("ocr")
+            else:
+                orphans.append(filename)
+                rows.append({**ERROR_FIELDS, "File_Name": filename})
+        if orphans:
+            logger.warning(
+                f"{len(orphans)} duplicates have no result to inherit (processing "
+                f"of their representative failed), written as errors: {orphans}"
+            )
+        if not rows:
+            return df
+        self._rows.update((row["File_Name"], row) for row in rows)
+        return pd.concat([df, pd.DataFrame(rows)], ignore_index=True)
+
+    def reset(self):
+        self.__init__(
+            tuple(self.stages),
+            text_threshold=self.text_threshold,
+        )
@@ -1,17 +1,22 @@
 import os
+import time
 from collections import namedtuple
 from datetime import datetime
 from typing import Any, Dict, Optional
 
-import google.generativeai as genai
 import pandas as pd
-from google.cloud import documentai_v1 as documentai
+from backends import get_backends
+from ocr.dedup import Deduplicator
+from ocr.prompts import DOCAI_GEMINI_PROMPT, GEMINI_PROMPT, classification_prompt
+from ocr.scheduler import Scheduler
 from pydantic import BaseModel, Field
-from tqdm import tqdm
 from utils.file_formatting import get_mime_type
+from utils.metrics import run_metrics
 from utils.parsing import parse_json_response
 from utils.reading import load_file_as_bytes
-from vertexai.preview.generative_models import GenerativeModel, Part
+
+# Text passed to the LLM for documents the OCR failed on
+OCR_ERROR_TEXT = "Nome, cognome e data non trovati. Metti ERRORE in tutti i campi"
 
 
 class DocumentField(BaseModel):
@@ -49,76 +54,26 @@ class DocumentProcessingResult(BaseModel):
         self.total_processed += 1
 
 
-def process_document_docAI(
-    project_id: str, location: str, processor_id: str, file_path: str
-):
-    """Processes a document using Document AI."""
-
-    document_ai_client = documentai.DocumentProcessorServiceClient()
-    processor_name = document_ai_client.processor_path(
-        project_id, location, processor_id
-    )
-    # Read the file into memory
-    with open(file_path, "rb") as image_file:
-        image_content = image_file.read()
-
-    # Create a RawDocument object
-    mime_type = get_mime_type(file_path)
-    raw_document = documentai.RawDocument(
-        content=image_content, mime_type=mime_type
-    )  # Adjust mime_type as needed
-
-    # Configure the ProcessRequest
-    request = documentai.ProcessRequest(name=processor_name, raw_document=raw_document)
-
-    # Call the Document AI API
-    result = document_ai_client.process_document(request=request)
-
-    # Get the Document object from the response
-    document = result.document
-
-    # Example: Accessing entities (if your processor extracts them)
-    if document.entities:
-        print("Extracted Entities:")
-        for entity in document.entities:
-            print(f"  Type: {entity.type_}, Mention Text: {entity.mention_text}")
-
-    return document.text
-
-
-def process_documents_docAI(config, tmp_folder: str = "tmp/"):
-    """
-    Process all documents in the tmp/ folder using Document AI.
-
-
-    Returns:
-        DocumentProcessingResult containing all processed documents
-    """
-
-    project_id: str = config["PROJECT_ID"]
-    location: str = config["LOCATION"]
-    processor_id: str = config["PROCESSOR_ID"]
-
-    result = []
-
+def list_input_files(tmp_folder: str = "tmp/") -> list[str]:
+    """Returns the names of the documents to process in ``tmp_folder``."""
     # Check if tmp folder exists
     if not os.path.exists(tmp_folder):
         print(f"Warning: {tmp_folder} directory does not exist")
         print(f"Current working directory: {os.getcwd()}")
         print(f"Absolute path to tmp folder: {os.path.abspath(tmp_folder)}")
-        return result
+        return []
 
     # Get list of files in tmp folder
     try:
         files = [
             f
             for f in os.listdir(tmp_folder)
-            if os.path.isfile(os.path.join(tmp_folder, f))
+            if os.path.isfile(os.path.join(tmp_folder, f)) and not f.endswith(".csv")
         ]
     except PermissionError:
         print(f"Error: Permission denied accessing {tmp_folder}")
         print(f"Current working directory: {os.getcwd()}")
-        return result
+        return []
 
     if not files:
         print(f"No files found in {tmp_folder}")
@@ -127,43 +82,73 @@ def process_documents_docAI(config, tmp_folder: str = "tmp/"):
         print(
             f"Contents of tmp folder: {os.listdir(tmp_folder) if os.path.exists(tmp_folder) else 'Directory does not exist'}"
         )
-        return result
+    return files
 
-    print(f"Found {len(files)} files to process")
-    print(f"Files: {files}")
 
-    # Process each file
-    for index, filename in tqdm(enumerate(files)):
-        if filename.endswith(".csv"):
-            continue
-        try:
-            # Process document with Document AI
-            extracted_fields = process_document_docAI(
-                project_id=project_id,
-                location=location,
-                processor_id=processor_id,
-                file_path=os.path.join(tmp_folder, filename),
-            )
-
-            # Create ProcessedDocument instance
-            processed_doc = namedtuple("ProcessedDocument", ["filename", "fields"])(
-                filename, extracted_fields
-            )
-
-            # Add to result
-            result.append(processed_doc)
-
-        except Exception as e:
-            processed_doc = namedtuple("ProcessedDocument", ["filename", "fields"])(
-                filename,
-                "Nome, cognome e data non trovati. Metti ERRORE in tutti i campi",
-            )
+def _ocr_text(ocr, tmp_folder: str, filename: str) -> str:
+    try:
+        return ocr.process(os.path.join(tmp_folder, filename))
+    except Exception:
+        # failed documents still end up in the .dat, with ERRORE fields
+        return OCR_ERROR_TEXT
+
+
+def process_documents_docAI(
+    config,
+    tmp_folder: str = "tmp/",
+    dedup: Deduplicator | None = None,
+    files: list[str] | None = None,
+):
+    """
+    Process all documents in the tmp/ folder using Document AI, on the
+    concurrent workers of the scheduler (see ocr/scheduler.py).
+
+    With ``dedup``, duplicate files are not sent to OCR and documents whose
+    text duplicates an earlier one are left out of the result.
+
+
+    Returns:
+        list of (filename, text) ProcessedDocument tuples
+    """
+    if files is None:
+        files = list_input_files(tmp_folder)
+    if dedup is not None:
+        unique = dedup.filter_files(tmp_folder, files)
+        run_metrics.count_saved("ocr", len(files) - len(unique))
+        files = unique
+    if not files:
+        return []
 
+    print(f"Found {len(files)} files to process")
+    ocr = get_backends(config).ocr
+
+    def task(filename):
+        start = time.perf_counter()
+        text = _ocr_text(ocr, tmp_folder, filename)
+        run_metrics.add_document_time(filename, time.perf_counter() - start)
+        return text
+
+    texts = Scheduler.from_config(config).run(tmp_folder, files, task)
+    ProcessedDocument = namedtuple("ProcessedDocument", ["filename", "fields"])
+    result = [ProcessedDocument(f, texts[f]) for f in files if f in texts]
+    if dedup is not None:
+        result = dedup.filter_texts(result, skip=OCR_ERROR_TEXT)
     return result
 
 
-def process_document_with_gemini(name, content, config):
-    model = GenerativeModel(config["LLM_MODEL"])
+def get_llm(config, system_instruction: str):
+    """
+    LLM backend with ``system_instruction`` compiled in once: registered as
+    cached context when LLM_CONTEXT_CACHE is enabled and supported.
+    """
+    cache = str(config.get("LLM_CONTEXT_CACHE", "True")).lower() == "true"
+    return get_backends(config).llm.with_system_instruction(
+        system_instruction, cache=cache
+    )
+
+
+def process_document_with_gemini(name, content, config, llm=None):
+    llm = llm or get_llm(config, GEMINI_PROMPT)
     mime = get_mime_type(name)
     if mime == "application/octet-stream":
         return {
@@ -171,193 +156,114 @@ def process_document_with_gemini(name, content, config):
             for k in ["File Name", "Nome", "Cognome", "Data", "Cluster"]
         }
     try:
-        part = Part.from_data(data=content, mime_type=mime)
-        prompt = """
-        Classifica ogni documento fornito, che può essere in formato TIFF, PDF o altri formati di immagine, assegnandolo a uno dei seguenti cluster specifici:
-
-            Provvedimenti a favore, Supervisione Mifid, Flessibilità orarie, Polizza sanitaria, Formazione, Fringe benefits, Assunzione matricola, Primo impiego, Fondo pensione, Nulla osta assunzione, Destinazione TFR, Nomina titolarità, Assegnazione ruolo, Part-time, Cessazione, Proroga TD, Provvedimenti disciplinari, Trasferimento, Lettera assunzione, Titolarità temporanee, Trasformazione TI, Proposta di assunzione. Se non sei sicuro al 100% della categoria, assegna "Nessun cluster".
-
-            Estrai inoltre da ogni documento i seguenti dati chiave: Nome, Cognome e Data (intesa come la data di redazione presente nel documento).
-
-            Procedi in modo accurato e dettagliato, analizzando il contenuto dei documenti per supportare la classificazione e l'estrazione delle informazioni.
-
-            # Steps
-
-            1. Analizza il contenuto del documento fornito (TIFF, PDF o altro formato immagine).
-            2. Identifica ed estrai con precisione Nome, Cognome e la Data di redazione dal testo.
-            3. Valuta il documento per determinarne la classificazione, confrontandolo con i cluster elencati.
-            4. Se la corrispondenza con un cluster è incerta, assegna "Nessun cluster".
-
-            # Output Format
-
-            Restituisci solo una risposta strutturata in JSON con i seguenti campi, senza commenti o spiegazioni aggiuntive:
-            ```json
-            {{
-            "File Name": "[Nome del file]",
-            "Nome": "[Nome estratto]",
-            "Cognome": "[Cognome estratto]",
-            "Data": "[Data estratta in formato ISO 8601, es.YYYY-MM-DD o 'Non Trovata']",
-            "Cluster": "[Nome cluster assegnato o 'Nessun cluster']"
-            }}
-            ```
-        """
-        res = model.generate_content([part, prompt])
-        return parse_json_response(res.text, name)
+        part = llm.file_part(content, mime)
+        res = llm.generate([part])
+        return parse_json_response(res, name)
     except:
         return {k: "Error" for k in ["File Name", "Nome", "Cognome", "Data", "Cluster"]}
 
 
-def all_process_documents_docAI_gemini(config, tmp_folder: str = "tmp/"):
-    model = GenerativeModel(config["LLM_MODEL"])
-    docs = process_documents_docAI(config, tmp_folder)
-    results = []
-    for index, (filename, document) in enumerate(docs):
+def _process_all(
+    config, tmp_folder: str, dedup: Deduplicator, process_one, with_ocr: bool
+) -> pd.DataFrame:
+    """
+    Runs ``process_one(filename, text)`` for every unique document on the
+    concurrent workers of the scheduler. OCR (``with_ocr``) and the LLM call
+    of a document run back to back on the same worker, so a document never
+    waits for the OCR of the whole batch.
+    """
+    files = list_input_files(tmp_folder)
+    # saved calls are counted by expand(), for the duplicates that actually
+    # inherit a result
+    unique = dedup.filter_files(tmp_folder, files)
+    if unique:
+        print(f"Found {len(unique)} files to process")
+    ocr = get_backends(config).ocr if with_ocr else None
+
+    def task(filename):
+        start = time.perf_counter()
+        text = None
+        if ocr is not None:
+            text = _ocr_text(ocr, tmp_folder, filename)
+            if dedup.is_text_duplicate(filename, text, skip=OCR_ERROR_TEXT):
+                run_metrics.add_document_time(filename, time.perf_counter() - start)
+                return None
+        fields = process_one(filename, text)
+        fields["File_Name"] = filename
+        run_metrics.add_document_time(filename, time.perf_counter() - start)
+        return fields
+
+    results = Scheduler.from_config(config).run(tmp_folder, unique, task)
+    rows = [results[f] for f in unique if results.get(f) is not None]
+    return dedup.expand(pd.DataFrame(rows), files, ocr=with_ocr)
+
+
+def all_process_documents_gemini(
+    config, tmp_folder: str = "tmp/", dedup: Deduplicator | None = None
+):
+    """Gemini only: the raw document bytes are classified without OCR."""
+    llm = get_llm(config, GEMINI_PROMPT)
+
+    def process_one(filename, _):
+        content = load_file_as_bytes(os.path.join(tmp_folder, filename))
+        return process_document_with_gemini(filename, content, config, llm=llm)
+
+    dedup = dedup or Deduplicator.from_config(config)
+    return _process_all(config, tmp_folder, dedup, process_one, with_ocr=False)
+
+
+def all_process_documents_docAI_gemini(
+    config, tmp_folder: str = "tmp/", dedup: Deduplicator | None = None
+):
+    llm = get_llm(config, DOCAI_GEMINI_PROMPT)
+
+    def process_one(filename, document):
         part = "FILENAME: " + filename + "\n" + "CONTENT: " + str(document)
-        prompt = """
-        Classifica ogni documento fornito, che ti verrà fornito sotto forma di testo, assegnandolo a uno dei seguenti cluster specifici:
-
-            Provvedimenti a favore, Supervisione Mifid, Flessibilità orarie, Polizza sanitaria, Formazione, Fringe benefits, Assunzione matricola, Primo impiego, Fondo pensione, Nulla osta assunzione, Destinazione TFR, Nomina titolarità, Assegnazione ruolo, Part-time, Cessazione, Proroga TD, Provvedimenti disciplinari, Trasferimento, Lettera assunzione, Titolarità temporanee, Trasformazione TI, Proposta di assunzione. Se non sei sicuro al 100% della categoria, assegna "Nessun cluster".
-
-            Estrai inoltre da ogni documento i seguenti dati chiave: Nome, Cognome e Data (intesa come la data di redazione presente nel documento).
-
-            Procedi in modo accurato e dettagliato, analizzando il contenuto dei documenti per supportare la classificazione e l'estrazione delle informazioni.
-
-            # Steps
-
-            1. Analizza il contenuto del documento fornito (TIFF, PDF o altro formato immagine).
-            2. Identifica ed estrai con precisione Nome, Cognome e la Data di redazione dal testo.
-            3. Valuta il documento per determinarne la classificazione, confrontandolo con i cluster elencati.
-            4. Se la corrispondenza con un cluster è incerta, assegna "Nessun cluster".
-
-            # Output Format
-
-            Restituisci solo una risposta strutturata in JSON con i seguenti campi, senza commenti o spiegazioni aggiuntive:
-            ```json
-            {{
-            "Nome": "[Nome estratto]",
-            "Cognome": "[Cognome estratto]",
-            "Data": "[Data estratta in formato ISO 8601, es.YYYY-MM-DD o 'Non Trovata']",
-            "Cluster": "[Nome cluster assegnato o 'Nessun cluster']"
-            }}
-            ```
-        """
-        res = model.generate_content([part, prompt])
-        results.append(parse_json_response(res.text, filename))
-    return pd.DataFrame(results)
-
-
-def all_process_documents_OVERPOWERED(config, tmp_folder: str = "tmp/"):
-    model = GenerativeModel(config["LLM_MODEL"])
-    docs = process_documents_docAI(config, tmp_folder)
-    results = []
-    df_cluster = pd.read_csv(config["CLUSTERS_PATH"])
-    cluster_classes = str(df_cluster["Cluster"].unique().tolist())
-    for index, (filename, document) in tqdm(enumerate(docs)):
+        try:
+            return parse_json_response(llm.generate([part]), filename)
+        except Exception:
+            return {k: "Error" for k in ["Nome", "Cognome", "Data", "Cluster"]}
+
+    dedup = dedup or Deduplicator.from_config(config)
+    return _process_all(config, tmp_folder, dedup, process_one, with_ocr=True)
+
+
+def all_process_documents_OVERPOWERED(
+    config, tmp_folder: str = "tmp/", dedup: Deduplicator | None = None
+):
+    # The prompt (with the cluster list) is compiled once and sent as system
+    # instruction, so each request only carries the document itself
+    llm = get_llm(config, classification_prompt(config))
+
+    def process_one(filename, document):
         byte_content = load_file_as_bytes(os.path.join(tmp_folder, filename))
-        byte_part = Part.from_data(data=byte_content, mime_type=get_mime_type(filename))
+        byte_part = llm.file_part(byte_content, get_mime_type(filename))
         message = "FILENAME: " + filename + "\n" + "CONTENT: " + str(document)
-        # Format the list as a bulleted string for the prompt
-
-    cluster_list_str = "- " + "\n- ".join(cluster_classes)
-
-    # Create the prompt using an f-string and inject the cluster list
-
-    old_prompt = f"""I documenti ti verranno forniti sia in forma di byte che di testo, con anche il filename.
-        Classifica ogni documento fornito, assegnandolo a uno dei seguenti cluster specifici:
-
-            Cluster (esempi in  lista python, considera i soli valori):
-            {cluster_classes}
-            Rispetta assolutamente i nomi dei cluster, non inventarti nomi. Se sei insicuro assegna "Nessun cluster".
-
-            Estrai inoltre da ogni documento i seguenti dati chiave: Nome, Cognome, Data (intesa come la data di redazione presente nel documento) e Country (intesa come il paese di redazione del documento, nome in inglese).
-            Se non è possibile estrarre il nome, il cognome o la data, restituisci "ERRORE" al posto del valore.
-
-            Procedi in modo accurato e dettagliato, analizzando il contenuto dei documenti per supportare la classificazione e l'estrazione delle informazioni.
-
-            # Steps
-
-            1. Analizza il contenuto del documento fornito (TIFF, PDF o altro formato immagine).
-            2. Identifica ed estrai con precisione Nome, Cognome e la Data di redazione dal testo.
-            3. Valuta il documento per determinarne la classificazione, confrontandolo con i cluster elencati.
-            4. Se la corrispondenza con un cluster è incerta, assegna "Nessun cluster".
-
-            # Output Format
-
-            Restituisci solo una risposta strutturata in JSON con i seguenti campi, senza commenti o spiegazioni aggiuntive:Add commentMore actions
-            ```jsonAdd commentMore actions
-            {{
-            "File_Name": "[Nome del file]",
-            "Nome": "[Nome estratto]",
-            "Cognome": "[Cognome estratto]",
-            "Data": "[Data estratta in formato ISO 8601, es.YYYY-MM-DD o 'ERRORE']",
-            "Cluster": "[Nome cluster assegnato o 'Nessun cluster']",
-            "Country": "[Paese di redazione del documento, nome in inglese o 'ERRORE']"
-            }}
-
-            ```
-            Esempio:
-            ```json
-            {{
-            "File_Name": "nome_file.pdf",
-            "Nome": "Mario",
-            "Cognome": "ERRORE",
-            "Data": "2002-01-04",
-            "Cluster": "Nessun cluster",
-            "Country": "Italy"
-            }}
-            ```
-            """
-    prompt = f"""
-        ## ROLE
-        You are an expert document processing AI. Your task is to perform classification and data extraction with high accuracy.
-
-        ## TASK
-        Analyze the provided document and perform two actions:
-        1.  **Classify** the document into one of the predefined categories.
-        2.  **Extract** key pieces of information from the text.
-
-        ## 1. CATEGORIES FOR CLASSIFICATION
-        The document must be assigned to ONE of the following categories. The assignment must be based on the primary purpose of the document, not just a casual mention. If the document's purpose does not clearly match any category, you MUST use "Nessun cluster".
-
-        {cluster_list_str}
-
-        ## 2. DATA EXTRACTION RULES
-        Extract the following fields according to these specific rules:
-
-        - **"Nome"**: Extract the first name of the primary subject or recipient of the document.
-        - **"Cognome"**: Extract the last name of the primary subject or recipient of the document.
-        - **"Data"**: Extract the main date of the document (e.g., signing date, issue date), usually found in the header or near the signature. It MUST be formatted as `YYYY-MM-DD`.
-        - **(Optional) "Country"**: Extract the country where the document was issued. Provide the name in English.
-
-        **IMPORTANT**: If any field's value cannot be reliably extracted from the document text, you MUST return the exact string "ERRORE" for that field.
-
-        ## 3. OUTPUT FORMAT
-        Your entire response must be a single, valid JSON object. Do NOT include any other text, explanations, or markdown indicators like ```json.
-
-        ### Example of a perfect response:
-        ```json
-        {{
-        "File_Name": "proposta_assunzione_rossi.pdf",
-        "Nome": "Mario",
-        "Cognome": "Rossi",
-        "Data": "2023-10-26",
-        "Cluster": "Proposta di assunzione",
-        "Country": "Italy"
-        }}
-        ```
-
-        ### Example of a response with errors:
-        ```json
-        {{
-        "File_Name": "documento_incompleto.tiff",
-        "Nome": "ERRORE",
-        "Cognome": "Bianchi",
-        "Data": "2024-05-12",
-        "Cluster": "Nessun cluster",
-        "Country": "ERRORE"
-        }}
-        ```
-        """
-    res = model.generate_content([prompt, message, byte_part])
-    results.append(parse_json_response(res.text, filename))
-    return pd.DataFrame(results)
+        try:
+            return parse_json_response(llm.generate([message, byte_part]), filename)
+        except Exception:
+            return {k: "Error" for k in ["Nome", "Cognome", "Data", "Cluster"]}
+
+    dedup = dedup or Deduplicator.from_config(config)
+    return _process_all(config, tmp_folder, dedup, process_one, with_ocr=True)
+
+
+# Execution modes selectable through config["PIPELINE_MODE"]
+PIPELINE_MODES = {
+    "overpowered": all_process_documents_OVERPOWERED,
+    "docai_gemini": all_process_documents_docAI_gemini,
+    "gemini": all_process_documents_gemini,
+}
+
+
+def warm_up(config):
+    """
+    Compiles the prompt of the selected PIPELINE_MODE and binds the LLM to it
+    (registering the cached context), so the first document does not pay it.
+    """
+    instruction = {
+        "overpowered": lambda: classification_prompt(config),
+        "docai_gemini": lambda: DOCAI_GEMINI_PROMPT,
+        "gemini": lambda: GEMINI_PROMPT,
+    }[config["PIPELINE_MODE"]]()
+    get_llm(config, instruction)
@@ -0,0 +1,144 @@
+"""
+Prompts sent to the LLM.
+
+They are used as *system instructions*: the static part of every request is
+compiled once per run and, when the backend supports it, registered as
+cached context instead of being re-uploaded with each document.
+"""
+
+from functools import lru_cache
+
+from utils.tables import read_clusters, source_fingerprint
+
+# Gemini only (``PIPELINE_MODE=gemini``): the document is sent as bytes
+GEMINI_PROMPT = """
+        Classifica ogni documento fornito, che può essere in formato TIFF, PDF o altri formati di immagine, assegnandolo a uno dei seguenti cluster specifici:
+
+            Provvedimenti a favore, Supervisione Mifid, Flessibilità orarie, Polizza sanitaria, Formazione, Fringe benefits, Assunzione matricola, Primo impiego, Fondo pensione, Nulla osta assunzione, Destinazione TFR, Nomina titolarità, Assegnazione ruolo, Part-time, Cessazione, Proroga TD, Provvedimenti disciplinari, Trasferimento, Lettera assunzione, Titolarità temporanee, Trasformazione TI, Proposta di assunzione. Se non sei sicuro al 100% della categoria, assegna "Nessun cluster".
+
+            Estrai inoltre da ogni documento i seguenti dati chiave: Nome, Cognome e Data (intesa come la data di redazione presente nel documento).
+
+            Procedi in modo accurato e dettagliato, analizzando il contenuto dei documenti per supportare la classificazione e l'estrazione delle informazioni.
+
+            # Steps
+
+            1. Analizza il contenuto del documento fornito (TIFF, PDF o altro formato immagine).
+            2. Identifica ed estrai con precisione Nome, Cognome e la Data di redazione dal testo.
+            3. Valuta il documento per determinarne la classificazione, confrontandolo con i cluster elencati.
+            4. Se la corrispondenza con un cluster è incerta, assegna "Nessun cluster".
+
+            # Output Format
+
+            Restituisci solo una risposta strutturata in JSON con i seguenti campi, senza commenti o spiegazioni aggiuntive:
+            ```json
+            {{
+            "File Name": "[Nome del file]",
+            "Nome": "[Nome estratto]",
+            "Cognome": "[Cognome estratto]",
+            "Data": "[Data estratta in formato ISO 8601, es.YYYY-MM-DD o 'Non Trovata']",
+            "Cluster": "[Nome cluster assegnato o 'Nessun cluster']"
+            }}
+            ```
+        """
+
+# Gemini on the Document AI text (``PIPELINE_MODE=docai_gemini``)
+DOCAI_GEMINI_PROMPT = """
+        Classifica ogni documento fornito, che ti verrà fornito sotto forma di testo, assegnandolo a uno dei seguenti cluster specifici:
+
+            Provvedimenti a favore, Supervisione Mifid, Flessibilità orarie, Polizza sanitaria, Formazione, Fringe benefits, Assunzione matricola, Primo impiego, Fondo pensione, Nulla osta assunzione, Destinazione TFR, Nomina titolarità, Assegnazione ruolo, Part-time, Cessazione, Proroga TD, Provvedimenti disciplinari, Trasferimento, Lettera assunzione, Titolarità temporanee, Trasformazione TI, Proposta di assunzione. Se non sei sicuro al 100% della categoria, assegna "Nessun cluster".
+
+            Estrai inoltre da ogni documento i seguenti dati chiave: Nome, Cognome e Data (intesa come la data di redazione presente nel documento).
+
+            Procedi in modo accurato e dettagliato, analizzando il contenuto dei documenti per supportare la classificazione e l'estrazione delle informazioni.
+
+            # Steps
+
+            1. Analizza il contenuto del documento fornito (TIFF, PDF o altro formato immagine).
+            2. Identifica ed estrai con precisione Nome, Cognome e la Data di redazione dal testo.
+            3. Valuta il documento per determinarne la classificazione, confrontandolo con i cluster elencati.
+            4. Se la corrispondenza con un cluster è incerta, assegna "Nessun cluster".
+
+            # Output Format
+
+            Restituisci solo una risposta strutturata in JSON con i seguenti campi, senza commenti o spiegazioni aggiuntive:
+            ```json
+            {{
+            "Nome": "[Nome estratto]",
+            "Cognome": "[Cognome estratto]",
+            "Data": "[Data estratta in formato ISO 8601, es.YYYY-MM-DD o 'Non Trovata']",
+            "Cluster": "[Nome cluster assegnato o 'Nessun cluster']"
+            }}
+            ```
+        """
+
+# Document AI text + bytes (``PIPELINE_MODE=overpowered``), formatted with
+# the bulleted list of clusters read from CLUSTERS_PATH
+CLASSIFICATION_PROMPT_TEMPLATE = """
+        ## ROLE
+        You are an expert document processing AI. Your task is to perform classification and data extraction with high accuracy.
+
+        ## TASK
+        Analyze the provided document and perform two actions:
+        1.  **Classify** the document into one of the predefined categories.
+        2.  **Extract** key pieces of information from the text.
+
+        ## 1. CATEGORIES FOR CLASSIFICATION
+        The document must be assigned to ONE of the following categories. The assignment must be based on the primary purpose of the document, not just a casual mention. If the document's purpose does not clearly match any category, you MUST use "Nessun cluster".
+
+        {cluster_list}
+
+        ## 2. DATA EXTRACTION RULES
+        Extract the following fields according to these specific rules:
+
+        - **"Nome"**: Extract the first name of the primary subject or recipient of the document.
+        - **"Cognome"**: Extract the last name of the primary subject or recipient of the document.
+        - **"Data"**: Extract the main date of the document (e.g., signing date, issue date), usually found in the header or near the signature. It MUST be formatted as `YYYY-MM-DD`.
+        - **(Optional) "Country"**: Extract the country where the document was issued. Provide the name in English.
+
+        **IMPORTANT**: If any field's value cannot be reliably extracted from the document text, you MUST return the exact string "ERRORE" for that field.
+
+        ## 3. OUTPUT FORMAT
+        Your entire response must be a single, valid JSON object. Do NOT include any other text, explanations, or markdown indicators like ```json.
+
+        ### Example of a perfect response:
+        ```json
+        {{
+        "File_Name": "proposta_assunzione_rossi.pdf",
+        "Nome": "Mario",
+        "Cognome": "Rossi",
+        "Data": "2023-10-26",
+        "Cluster": "Proposta di assunzione",
+        "Country": "Italy"
+        }}
+        ```
+
+        ### Example of a response with errors:
+        ```json
+        {{
+        "File_Name": "documento_incompleto.tiff",
+        "Nome": "ERRORE",
+        "Cognome": "Bianchi",
+        "Data": "2024-05-12",
+        "Cluster": "Nessun cluster",
+        "Country": "ERRORE"
+        }}
+        ```
+        """
+
+
+@lru_cache(maxsize=8)
+def _compile_classification_prompt(clusters_path: str, fingerprint: str) -> str:
+    df_cluster = read_clusters(clusters_path)
+    cluster_classes = df_cluster["Cluster"].dropna().unique().tolist()
+    # Format the list as a bulleted string for the prompt
+    cluster_list = "- " + "\n        - ".join(str(c) for c in cluster_classes)
+    return CLASSIFICATION_PROMPT_TEMPLATE.format(cluster_list=cluster_list)
+
+
+def classification_prompt(config: dict) -> str:
+    """
+    Returns the classification prompt for the clusters in CLUSTERS_PATH.
+    Compiled once and reused until the CSV changes (locally or on GCS).
+    """
+    path = config["CLUSTERS_PATH"]
+    return _compile_classification_prompt(path, source_fingerprint(path))
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+
+class RunMetrics:
+    """
+    Collects latency and API-call counters for a single pipeline run.
+
+    Per-document latency is accumulated over every stage that touches the
+    document (OCR + LLM), so percentiles reflect what a single file costs.
+    """
+
+    def __init__(self):
+        # counters are updated by concurrent OCR/LLM workers
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.perf_counter()
+        self.document_seconds: dict[str, float] = defaultdict(float)
+        self.stage_seconds: dict[str, float] = defaultdict(float)
+        self.api_calls: Counter = Counter()
+        # calls avoided, e.g. for duplicate documents (see ocr/dedup.py)
+        self.api_calls_saved: Counter = Counter()
+        self.usage: Counter = Counter()
+        self.extra: dict = {}
+
+    def add_document_time(self, filename: str, seconds: float):
+        with self._lock:
+            self.document_seconds[filename] += seconds
+
+    def add_stage_time(self, stage: str, seconds: float):
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, time.perf_counter() - start)
+
+    def count_call(self, api: str, n: int = 1):
+        with self._lock:
+            self.api_calls[api] += n
+
+    def count_saved(self, api: str, n: int = 1):
+        with self._lock:
+            self.api_calls_saved[api] += n
+
+    def count_usage(self, key: str, n: int):
+        with self._lock:
+            self.usage[key] += n
+
+    def summary(self) -> dict:
+        wall = time.perf_counter() - self.started_at
+        latencies = sorted(self.document_seconds.values())
+        n_docs = len(latencies)
+        return {
+            "documents": n_docs,
+            "wall_seconds": round(wall, 4),
+            "throughput_docs_per_s": round(n_docs / wall, 4) if wall > 0 else 0.0,
+            "latency_p50_s": _percentile(latencies, 50),
+            "latency_p95_s": _percentile(latencies, 95),
+            "latency_p99_s": _percentile(latencies, 99),
+            "latency_max_s": round(latencies[-1], 4) if latencies else 0.0,
+            "stage_seconds": {k: round(v, 4) for k, v in self.stage_seconds.items()},
+            "api_calls": dict(self.api_calls),
+            "api_calls_saved": dict(self.api_calls_saved),
+            "usage": dict(self.usage),
+            **self.extra,
+        }
+
+    def dump(self, path: str = "tmp/processed/run_metrics.json") -> str:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile on an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(
+        0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1)
+    )
+    return round(sorted_values[rank], 4)
+
+
+# Shared by the pipeline stages and the backends of the current process
+run_metrics = RunMetrics()
@@ -1,4 +1,4 @@
-import pandas as pd
+from utils.tables import read_table
 
 
 def load_file_as_bytes(file_path: str) -> bytes:
@@ -23,5 +23,6 @@ def load_file_as_bytes(file_path: str) -> bytes:
         return b""  # Return empty bytes or raise an exception
 
 
-def read_csv_from_gcs(name, bucket_name, data_prefix):
-    return pd.read_csv(f"gs://{bucket_name}/{data_prefix}{name}")
+def read_csv_from_gcs(name, bucket_name, data_prefix, columns=None):
+    # Downloaded and converted to Parquet once per object generation
+    return read_table(f"gs://{bucket_name}/{data_prefix}{name}", columns=columns)
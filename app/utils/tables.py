@@ -0,0 +1,141 @@
+"""
+Columnar (Arrow/Parquet) storage of the tables the pipeline reads and writes.
+
+Reference tables (personnel, clusters) are maintained as CSV, locally or on
+GCS. They are converted once to a typed Parquet copy in ``tmp/cache/`` and
+re-converted only when the source changes (mtime/size locally, object
+generation on GCS). Reads are memory-mapped and only decode the requested
+columns.
+
+Extracted results are written as Parquet as well: one file per run, or one
+part per batch in a dataset directory that can be scanned as a whole
+(worker accumulation, multi-run history). CSV is only used for the
+final ``.dat``.
+
+pyarrow is imported on first use, it is not needed to import ``main``.
+"""
+
+import hashlib
+import os
+
+import pandas as pd
+
+CACHE_DIR = "tmp/cache"
+
+# Explicit types: nothing is inferred from the CSV content (e.g. Person
+# Number stays a string, leading zeros included)
+PERSONALE_COLUMNS = {"Person Number": "string", "Nome": "string", "Cognome": "string"}
+CLUSTERS_COLUMNS = {"Cluster": "string"}
+
+# Metadata stored in the Parquet copy to validate it against its source
+_SOURCE_KEY = b"source_fingerprint"
+
+
+def source_fingerprint(path: str) -> str:
+    """Changes whenever the source file does: mtime/size, or GCS generation."""
+    if path.startswith("gs://"):
+        import gcsfs
+
+        info = gcsfs.GCSFileSystem().info(path)
+        return f"gcs:{info.get('generation')}:{info['size']}"
+    stat = os.stat(path)
+    return f"local:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def cache_path(path: str, ext: str = ".parquet") -> str:
+    """Location in CACHE_DIR of a derived copy of ``path``."""
+    digest = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}.{digest}{ext}")
+
+
+def _csv_to_parquet(path: str, dtypes: dict[str, str] | None, target: str, fp: str):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = pd.read_csv(path, dtype=dtypes or "string")
+    table = pa.Table.from_pandas(df.astype("string"), preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), _SOURCE_KEY: fp.encode()}
+    )
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # write + rename: a concurrent reader never sees a partial file
+    tmp = f"{target}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, target)
+
+
+def parquet_path(path: str, dtypes: dict[str, str] | None = None) -> str:
+    """
+    Returns the Parquet version of ``path``: the path itself for .parquet
+    files, otherwise a cached conversion of the CSV, rebuilt if stale.
+    """
+    if path.endswith(".parquet"):
+        return path
+    import pyarrow.parquet as pq
+
+    fp = source_fingerprint(path)
+    target = cache_path(path)
+    if os.path.exists(target):
+        metadata = pq.read_schema(target, memory_map=True).metadata or {}
+        if metadata.get(_SOURCE_KEY) == fp.encode():
+            return target
+    _csv_to_parquet(path, dtypes, target, fp)
+    return target
+
+
+def read_table(
+    path: str,
+    columns: list[str] | None = None,
+    dtypes: dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """
+    Reads ``columns`` of a Parquet file, Parquet dataset directory or CSV
+    (through its cached Parquet copy). Files are memory-mapped and string
+    columns stay Arrow-backed (``string[pyarrow]``).
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    if os.path.isdir(path):
+        parts = sorted(
+            os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet")
+        )
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        # parts may not share every column (e.g. batches made only of errors)
+        schema = pa.unify_schemas([pq.read_schema(p) for p in parts])
+        if columns is not None:
+            columns = [c for c in columns if c in schema.names]
+        table = ds.dataset(parts, schema=schema, format="parquet").to_table(
+            columns=columns
+        )
+    else:
+        table = pq.read_table(
+            parquet_path(path, dtypes), columns=columns, memory_map=True
+        )
+    # Arrow-backed strings: no Python object per cell
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+
+def read_personale(path: str) -> pd.DataFrame:
+    return read_table(path, list(PERSONALE_COLUMNS), PERSONALE_COLUMNS)
+
+
+def read_clusters(path: str) -> pd.DataFrame:
+    return read_table(path, list(CLUSTERS_COLUMNS), CLUSTERS_COLUMNS)
+
+
+def write_results(df: pd.DataFrame, path: str) -> str:
+    """
+    Writes the extracted results (all string columns, missing values kept
+    as nulls). ``path`` may be a file or a part inside a dataset directory.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    table = pa.Table.from_pandas(df.astype("string"), preserve_index=False)
+    pq.write_table(table, path)
+    return path
@@ -0,0 +1,343 @@
+"""
+Long-running worker: processes documents as they arrive.
+
+Unlike ``main.main`` (one batch per process) the worker keeps the backends,
+the personnel registry and the compiled prompt warm, and accepts document
+notifications either over HTTP (Pub/Sub push subscription on the GCS
+bucket, or a plain JSON POST) or from an in-process queue.
+
+Arriving documents are micro-batched: a batch is processed through
+OCR/LLM as soon as it holds WORKER_MAX_BATCH documents or its oldest
+document has waited WORKER_MAX_LATENCY_S. Results accumulate and are
+flushed (.dat + zip upload, as in the batch job) every
+WORKER_FLUSH_INTERVAL_S seconds and on shutdown.
+
+Usage:
+    python worker.py                   # HTTP on $PORT (default 8080)
+    python worker.py --enqueue-bucket --once --no-http   # local, drain INPUT_BUCKET
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import queue
+import shutil as sh
+import signal
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from backends import get_backends
+from config import load_config
+from etl.pipeline import run_etl
+from etl.registry import load_registry
+from exporter import is_document, zip_and_upload
+from gcs_utils import download_blob
+from ocr.dedup import Deduplicator
+from ocr.document_ai import PIPELINE_MODES, warm_up
+from utils.metrics import run_metrics
+from utils.tables import read_table, write_results
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Delay before a failed flush (ETL, upload) is attempted again
+FLUSH_RETRY_S = 30.0
+
+
+class Worker:
+    def __init__(self, config: dict, work_dir: str = "tmp/worker"):
+        self.config = config
+        self.max_batch = int(config.get("WORKER_MAX_BATCH") or 16)
+        self.max_latency_s = float(config.get("WORKER_MAX_LATENCY_S") or 2.0)
+        self.flush_interval_s = float(config.get("WORKER_FLUSH_INTERVAL_S") or 300)
+        self.batch_dir = os.path.join(work_dir, "batch")
+        self.pending_dir = os.path.join(work_dir, "pending")
+        # one Parquet part per processed batch, read back as a whole on flush
+        self.results_dir = os.path.join(work_dir, "results")
+        os.makedirs(self.pending_dir, exist_ok=True)
+        os.makedirs(self.results_dir, exist_ok=True)
+
+        # Everything a batch job pays on start-up is paid once here
+        get_backends(config)
+        load_registry(config["PERSONALE_PATH"])
+        self.process_documents = PIPELINE_MODES[config["PIPELINE_MODE"]]
+        # duplicates are detected across every batch of a flush window
+        self.dedup = Deduplicator.from_config(config)
+        warm_up(config)
+
+        self.queue: queue.Queue = queue.Queue()
+        self.n_pending = 0
+        self.n_batches = 0
+        self._next_flush = time.monotonic() + self.flush_interval_s
+        self._stop = threading.Event()
+        # no document is enqueued once stop() was called: the final drain
+        # sees everything that was acknowledged
+        self._intake_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        run_metrics.reset()
+
+    # -- intake -------------------------------------------------------------
+
+    def submit(self, bucket_name: str, blob_name: str) -> bool:
+        """
+        Enqueues a document notification (the local stand-in for Pub/Sub).
+        Returns False when the worker is stopping and the notification must
+        not be acknowledged.
+        """
+        if blob_name.endswith("/") or not is_document(blob_name):
+            logger.info(f"Ignoring non-document object {blob_name}")
+            return True
+        with self._intake_lock:
+            if self._stop.is_set():
+                return False
+            self.queue.put((bucket_name, blob_name, time.monotonic()))
+        return True
+
+    # -- processing ---------------------------------------------------------
+
+    def _next_batch(self) -> list[tuple[str, str, float]]:
+        """
+        Waits for the first document (at most until the next flush is due),
+        then collects more until the batch is full or the first one has
+        waited max_latency_s.
+        """
+        # wake up at least every second to honour stop() and flush deadlines
+        timeout = self._next_flush - time.monotonic()
+        try:
+            batch = [self.queue.get(timeout=min(max(timeout, 0.01), 1.0))]
+        except queue.Empty:
+            return []
+        deadline = batch[0][2] + self.max_latency_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def process_batch(self, batch: list[tuple[str, str, float]]):
+        os.makedirs(self.batch_dir, exist_ok=True)
+        enqueued_at = {}
+        try:
+            for bucket_name, blob_name, t in batch:
+                try:
+                    path = download_blob(
+                        self.config, bucket_name, blob_name, self.batch_dir
+                    )
+                    enqueued_at[os.path.basename(path)] = t
+                except Exception as e:
+                    logger.error(f"Error downloading {blob_name}: {e}")
+
+            with run_metrics.stage("ocr_llm"):
+                df = self.process_documents(
+                    self.config, tmp_folder=self.batch_dir, dedup=self.dedup
+                )
+            done = time.monotonic()
+
+            # Per-document latency = time in queue + processing time
+            for filename, t in enqueued_at.items():
+                processing = run_metrics.document_seconds.get(filename, 0.0)
+                run_metrics.add_document_time(filename, done - t - processing)
+                # keep the documents for the zip of the next flush
+                os.replace(
+                    os.path.join(self.batch_dir, filename),
+                    os.path.join(self.pending_dir, filename),
+                )
+            if not df.empty:
+                write_results(
+                    df,
+                    os.path.join(
+                        self.results_dir, f"batch-{self.n_batches:06d}.parquet"
+                    ),
+                )
+                self.n_pending += len(df)
+            self.n_batches += 1
+            logger.info(f"Processed batch of {len(batch)} documents")
+        finally:
+            sh.rmtree(self.batch_dir, ignore_errors=True)
+
+    def flush(self) -> str | None:
+        """Runs the ETL on the accumulated results and uploads .dat + zip."""
+        if not self.n_pending:
+            self._next_flush = time.monotonic() + self.flush_interval_s
+            return None
+        df_results = read_table(self.results_dir)
+
+        with run_metrics.stage("etl"):
+            metadata = run_etl(df_results, self.config)
+        run_id = "{}/{}".format(
+            self.config.get("RUN_ID") or "worker",
+            datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"),
+        )
+        with run_metrics.stage("export"):
+            zip_path = zip_and_upload(
+                metadata, config=self.config, run_id=run_id, tmp_dir=self.pending_dir
+            )
+
+        run_metrics.extra.update(
+            pipeline_mode=self.config["PIPELINE_MODE"], batches=self.n_batches
+        )
+        run_metrics.dump()
+        logger.info(f"Flushed {len(df_results)} documents: {run_metrics.summary()}")
+        run_metrics.reset()
+        self.dedup.reset()
+        self.n_batches = 0
+        self.n_pending = 0
+        for folder in (self.pending_dir, self.results_dir):
+            sh.rmtree(folder, ignore_errors=True)
+            os.makedirs(folder, exist_ok=True)
+        self._next_flush = time.monotonic() + self.flush_interval_s
+        return zip_path
+
+    def _flush(self):
+        """flush(), keeping the pending results for a retry when it fails."""
+        try:
+            self.flush()
+        except Exception as e:
+            retry_s = min(self.flush_interval_s, FLUSH_RETRY_S)
+            self._next_flush = time.monotonic() + retry_s
+            logger.exception(
+                f"Flush of {self.n_pending} documents failed, results kept in "
+                f"{self.results_dir} for a retry: {e}"
+            )
+
+    def _process(self, batch: list[tuple[str, str, float]]):
+        try:
+            self.process_batch(batch)
+        except Exception as e:
+            logger.exception(f"Batch of {len(batch)} documents failed: {e}")
+
+    def run(self, once: bool = False):
+        """Main loop; with ``once`` it returns when the queue is drained."""
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._process(batch)
+            elif once:
+                break
+            if time.monotonic() >= self._next_flush:
+                self._flush()
+        # documents acknowledged before stop() are processed before the
+        # final flush
+        if not self.queue.empty():
+            logger.info(f"Draining {self.queue.qsize()} queued documents")
+        while not self.queue.empty():
+            self._process(self._next_batch())
+        self._flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="worker", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops accepting documents, processes the ones already queued and
+        flushes what is pending.
+        """
+        with self._intake_lock:
+            self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def parse_notification(body: bytes) -> tuple[str, str] | None:
+    """
+    Returns (bucket, object name) from a Pub/Sub push request for a GCS
+    notification, or from a plain ``{"bucket": ..., "name": ...}`` body.
+    Returns None for notifications that are not a new object (delete,
+    archive, metadata update).
+    """
+    payload = json.loads(body or b"{}")
+    message = payload.get("message")
+    if message is None:
+        return payload["bucket"], payload["name"]
+    attributes = message.get("attributes") or {}
+    if attributes.get("eventType", "OBJECT_FINALIZE") != "OBJECT_FINALIZE":
+        return None
+    if "bucketId" in attributes and "objectId" in attributes:
+        return attributes["bucketId"], attributes["objectId"]
+    data = json.loads(base64.b64decode(message["data"]))
+    return data["bucket"], data["name"]
+
+
+def make_handler(worker: Worker):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/healthz":
+                self.send_error(404)
+                return
+            body = json.dumps({"queued": worker.queue.qsize()}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                notification = parse_notification(self.rfile.read(length))
+            except (KeyError, ValueError) as e:
+                self.send_error(400, f"Invalid notification: {e}")
+                return
+            if notification is not None and not worker.submit(*notification):
+                # not acknowledged: Pub/Sub redelivers it to another instance
+                self.send_error(503, "Worker is shutting down")
+                return
+            # 2xx acknowledges the Pub/Sub message
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8080")))
+    parser.add_argument(
+        "--no-http", action="store_true", help="Only use the in-process queue"
+    )
+    parser.add_argument(
+        "--enqueue-bucket",
+        action="store_true",
+        help="Enqueue every document currently in INPUT_BUCKET",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Exit when the queue is drained"
+    )
+    args = parser.parse_args()
+
+    config = load_config()
+    worker = Worker(config)
+    if args.enqueue_bucket:
+        storage = get_backends(config).storage
+        for blob_name in storage.list_blobs(config["INPUT_BUCKET"]):
+            worker.submit(config["INPUT_BUCKET"], blob_name)
+
+    if args.no_http:
+        worker.run(once=args.once)
+    else:
+        server = ThreadingHTTPServer(("", args.port), make_handler(worker))
+        # Cloud Run sends SIGTERM before stopping the instance: flush first
+        signal.signal(
+            signal.SIGTERM,
+            lambda *_: threading.Thread(target=server.shutdown).start(),
+        )
+        worker.start()
+        logger.info(f"Worker listening on :{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            worker.stop()
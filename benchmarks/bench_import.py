@@ -0,0 +1,113 @@
+"""
+Cold-start guard for the Cloud Run job entry point.
+
+Runs ``python -X importtime -c "import main"`` in ``app/`` a few times and
+fails (exit code 1) if the cumulative import time of ``main`` exceeds the
+budget, or if importing it pulls in any of the Google SDKs, which must only
+be imported lazily by the backend that uses them (see ``backends/gcp.py``).
+
+Usage:
+    python benchmarks/bench_import.py --budget-ms 1000
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+
+# Must not be imported by `import main` (nor by building the backends)
+LAZY_MODULES = [
+    "google.cloud.storage",
+    "google.cloud.documentai_v1",
+    "google.generativeai",
+    "vertexai",
+]
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(statement: str) -> list[tuple[int, int, int, str]]:
+    """(self µs, cumulative µs, depth, module) for every module imported."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=APP_DIR,
+        env={**os.environ, "PYTHONPATH": APP_DIR},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append((int(m[1]), int(m[2]), len(m[3]) // 2, m[4]))
+    return rows
+
+
+def loaded_modules(statement: str) -> set[str]:
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"{statement}; import json, sys; print(json.dumps(sorted(sys.modules)))",
+        ],
+        cwd=APP_DIR,
+        env={**os.environ, "PYTHONPATH": APP_DIR},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=1000.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    # Building the backends must stay import-free too: clients (and SDKs)
+    # are created on first use
+    statement = (
+        "import main; from config import load_config; "
+        "from backends import get_backends; get_backends(load_config())"
+    )
+
+    # Best of N runs: the first one also pays for cold .pyc / page cache
+    runs = [import_times(statement) for _ in range(args.repeat)]
+    best = min(runs, key=lambda rows: sum(r[1] for r in rows if r[2] == 0))
+    total_ms = sum(r[1] for r in best if r[2] == 0) / 1000
+
+    print(
+        f"Import time of the entry point: {total_ms:.1f} ms (budget {args.budget_ms} ms)"
+    )
+    print(f"\nTop {args.top} top-level imports by cumulative time:")
+    for _, cumulative, _, module in sorted(
+        (r for r in best if r[2] == 0), key=lambda r: r[1], reverse=True
+    )[: args.top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {module}")
+
+    leaked = [
+        m
+        for m in LAZY_MODULES
+        if any(x == m or x.startswith(m + ".") for x in loaded_modules(statement))
+    ]
+    ok = True
+    if leaked:
+        print(f"\nFAIL: eagerly imported SDKs: {', '.join(leaked)}")
+        ok = False
+    if total_ms > args.budget_ms:
+        print(f"\nFAIL: import time {total_ms:.1f} ms exceeds {args.budget_ms} ms")
+        ok = False
+    if ok:
+        print("\nOK")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
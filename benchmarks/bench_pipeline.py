@@ -0,0 +1,186 @@
+"""
+End-to-end throughput benchmark of ``main.main`` on the fake backends.
+
+For every corpus size a synthetic corpus is generated once (see
+``corpus.py``), then the full pipeline runs in a fresh subprocess per
+execution mode (``PIPELINE_MODE``) with ``BACKEND=fake``. Each run reports
+throughput, per-document tail latency (from ``tmp/processed/run_metrics.json``),
+the predicted and actual makespan of the OCR/LLM stage (``ocr/scheduler.py``),
+the peak RSS of the process and the accuracy of the produced .dat against the
+synthetic ground truth (``app/evaluation.py``, report in ``eval_report.json``).
+
+Usage:
+    python benchmarks/bench_pipeline.py --sizes 100 10000 100000 \\
+        --ocr-latency-ms 5 --llm-latency-ms 20 --error-rate 0.01
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from corpus import generate_corpus
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+
+from evaluation import evaluate, write_report  # noqa: E402
+
+MODES = ["overpowered", "docai_gemini", "gemini"]
+
+
+def run_pipeline(run_dir: str, env: dict[str, str]) -> dict:
+    """Runs ``main.main`` in a subprocess and returns its metrics + peak RSS."""
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, "pipeline.log"), "w") as log:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-c", "import main; main.main()"],
+            cwd=run_dir,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        # wait4 gives the rusage of this child only (RUSAGE_CHILDREN would
+        # keep the maximum over every previous run)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(
+            f"Pipeline failed in {run_dir} (exit {proc.returncode}), see pipeline.log"
+        )
+
+    with open(os.path.join(run_dir, "tmp", "processed", "run_metrics.json")) as f:
+        metrics = json.load(f)
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    metrics["process_seconds"] = round(elapsed, 4)
+    metrics["peak_rss_mb"] = round(rusage.ru_maxrss * scale / 2**20, 1)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--workdir", default="bench_runs")
+    parser.add_argument("--storage-latency-ms", type=float, default=0.0)
+    parser.add_argument("--ocr-latency-ms", type=float, default=0.0)
+    parser.add_argument("--ocr-latency-per-page-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--page-kb", type=float, default=0.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--form-letter-rate",
+        type=float,
+        default=0.0,
+        help="Share of documents that are an earlier letter sent to someone else",
+    )
+    parser.add_argument("--dedup", default="exact,text", help="DEDUP stages")
+    parser.add_argument("--workers", type=int, default=4, help="SCHED_WORKERS")
+    parser.add_argument(
+        "--oversized-workers", type=int, default=1, help="SCHED_OVERSIZED_WORKERS"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--min-accuracy",
+        type=float,
+        default=0.95,
+        help="Accuracy bar (full match rate) used to pick the fastest mode",
+    )
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir)
+    results = []
+    for size in args.sizes:
+        corpus_dir = os.path.join(workdir, f"corpus_{size}")
+        print(f"Generating corpus of {size} documents in {corpus_dir}...")
+        paths = generate_corpus(
+            corpus_dir,
+            size,
+            max_pages=args.max_pages,
+            page_kb=args.page_kb,
+            duplicate_rate=args.duplicate_rate,
+            form_letter_rate=args.form_letter_rate,
+            seed=args.seed,
+        )
+        for mode in args.modes:
+            run_id = f"{mode}_{size}"
+            env = {
+                **os.environ,
+                **paths,
+                "PYTHONPATH": APP_DIR,
+                "BACKEND": "fake",
+                "PIPELINE_MODE": mode,
+                "RUN_ID": run_id,
+                "DEDUP": args.dedup,
+                "SCHED_WORKERS": str(args.workers),
+                "SCHED_OVERSIZED_WORKERS": str(args.oversized_workers),
+                "OUTPUT_BUCKET": "output-bucket",
+                "FAKE_STORAGE_LATENCY_MS": str(args.storage_latency_ms),
+                "FAKE_OCR_LATENCY_MS": str(args.ocr_latency_ms),
+                "FAKE_OCR_LATENCY_PER_PAGE_MS": str(args.ocr_latency_per_page_ms),
+                "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+                "FAKE_LATENCY_SIGMA": str(args.latency_sigma),
+                "FAKE_ERROR_RATE": str(args.error_rate),
+                "FAKE_SEED": str(args.seed),
+            }
+            print(f"Running mode={mode} size={size}...")
+            run_dir = os.path.join(workdir, "runs", run_id)
+            metrics = run_pipeline(run_dir, env)
+            report = evaluate(
+                os.path.join(run_dir, "tmp", "processed", "DocumentsOfRecord.dat"),
+                paths["TRAIN_GT_PATH"],
+            )
+            write_report(report)
+            metrics["accuracy"] = report["accuracy"]["full"]
+            results.append({"size": size, "mode": mode, **metrics})
+
+    header = (
+        f"{'size':>8} {'mode':<14} {'docs/s':>10} {'p50 s':>8} {'p95 s':>8} "
+        f"{'p99 s':>8} {'RSS MB':>8} {'saved':>7} {'pred s':>8} {'make s':>8} "
+        f"{'acc':>7}"
+    )
+    print("\n" + header + "\n" + "-" * len(header))
+    for r in results:
+        print(
+            f"{r['size']:>8} {r['mode']:<14} {r['throughput_docs_per_s']:>10.2f} "
+            f"{r['latency_p50_s']:>8.4f} {r['latency_p95_s']:>8.4f} "
+            f"{r['latency_p99_s']:>8.4f} {r['peak_rss_mb']:>8.1f} "
+            f"{sum(r['api_calls_saved'].values()):>7} "
+            f"{r['schedule']['predicted_makespan_calibrated_s']:>8.2f} "
+            f"{r['schedule']['actual_makespan_s']:>8.2f} {r['accuracy']:>7.2%}"
+        )
+
+    print()
+    for size in args.sizes:
+        eligible = [
+            r
+            for r in results
+            if r["size"] == size and r["accuracy"] >= args.min_accuracy
+        ]
+        if eligible:
+            best = max(eligible, key=lambda r: r["throughput_docs_per_s"])
+            print(
+                f"size={size}: fastest mode with accuracy >= "
+                f"{args.min_accuracy:.0%} is '{best['mode']}'"
+            )
+        else:
+            print(f"size={size}: no mode reaches accuracy {args.min_accuracy:.0%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Synthetic corpus generator for offline benchmarks.
+
+Writes a fake input bucket full of small PDFs together with the reference
+tables the pipeline expects (``personale.csv``, ``clusters.csv``) and the
+``doc_trains.csv`` ground truth, all consistent with each other::
+
+    <out_dir>/
+    ├── gcs/<bucket>/documents/*.pdf   # read by BACKEND=fake (FAKE_ROOT=<out_dir>/gcs)
+    └── etl_db_data/
+        ├── clusters.csv
+        ├── doc_trains.csv
+        └── personale.csv
+
+Every PDF carries the fields the fake LLM extracts (``Dipendente:``,
+``Data:``, ``Oggetto:``, ``Paese:``) as real text objects, so the fake OCR
+has something to read and the output can be scored against the ground truth.
+
+Usage:
+    python benchmarks/corpus.py --out bench_data/1k --documents 1000
+"""
+
+import argparse
+import csv
+import os
+import random
+import shutil
+from datetime import date, timedelta
+
+CLUSTERS = [
+    "Provvedimenti a favore",
+    "Supervisione Mifid",
+    "Flessibilità orarie",
+    "Polizza sanitaria",
+    "Formazione",
+    "Fringe benefits",
+    "Assunzione matricola",
+    "Primo impiego",
+    "Fondo pensione",
+    "Nulla osta assunzione",
+    "Destinazione TFR",
+    "Nomina titolarità",
+    "Assegnazione ruolo",
+    "Part-time",
+    "Cessazione",
+    "Proroga TD",
+    "Provvedimenti disciplinari",
+    "Trasferimento",
+    "Lettera assunzione",
+    "Titolarità temporanee",
+    "Trasformazione TI",
+    "Proposta di assunzione",
+]
+FIRST_NAMES = (
+    "Mario Luca Giulia Anna Marco Francesca Paolo Sara Andrea Chiara Matteo Elena "
+    "Davide Laura Stefano Silvia Alessandro Marta Simone Valentina Roberto Federica "
+    "Giorgio Martina Daniele Alessia Fabio Elisa Riccardo Ilaria Ettore Omar Maurizio"
+).split()
+LAST_NAMES = (
+    "Rossi Bianchi Ferrari Russo Esposito Romano Colombo Ricci Marino Greco Bruno "
+    "Gallo Conti Costa Giordano Mancini Rizzo Lombardi Moretti Barbieri Fontana "
+    "Santoro Mariani Rinaldi Caruso Ferrara Galli Martini Leone Longo Gentile "
+    "Martinelli Vitale Lombardo Serra Coppola Sassi Pedretti Peroni Candeloro"
+).split()
+COUNTRIES = ["Italy", "Italy", "Italy", "Italy", "Luxembourg", "Spain"]
+# Body of the letters: a few of these sentences, in random order
+LETTER_BODY = [
+    "Facendo seguito agli accordi intercorsi le confermiamo quanto segue.",
+    "Le condizioni economiche restano invariate salvo quanto di seguito indicato.",
+    "La decorrenza del provvedimento coincide con la data della presente.",
+    "Per ogni chiarimento potra rivolgersi all'ufficio del personale di riferimento.",
+    "La preghiamo di restituirci copia della presente firmata per accettazione.",
+    "Il presente documento sostituisce ogni precedente comunicazione in materia.",
+    "Resta inteso che per quanto non espressamente previsto valgono le norme di legge.",
+    "La informiamo inoltre che i dati saranno trattati nel rispetto della normativa.",
+    "L'efficacia della presente e subordinata al rispetto delle procedure aziendali.",
+    "Con l'occasione le porgiamo i nostri migliori saluti e auguri di buon lavoro.",
+]
+FILLER = (
+    "Con la presente si comunica quanto in oggetto, secondo le condizioni "
+    "previste dal contratto collettivo nazionale di lavoro vigente."
+)
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list[list[str]], padding_bytes: int = 0) -> int:
+    """
+    Writes a minimal, valid PDF with one text line per ``Tj`` operator.
+
+    ``padding_bytes`` per page are appended as a PDF comment to emulate the
+    size of scanned images. Returns the number of bytes written.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for lines in pages:
+        ops = ["BT /F1 11 Tf 72 760 Td 14 TL"]
+        ops += [f"({_pdf_escape(line)}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1", errors="replace")
+        if padding_bytes:
+            stream += b"\n%" + b"x" * padding_bytes
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    out += b"startxref\n%d\n%%%%EOF\n" % xref
+    with open(path, "wb") as f:
+        f.write(out)
+    return len(out)
+
+
+def generate_corpus(
+    out_dir: str,
+    n_documents: int,
+    *,
+    n_personnel: int | None = None,
+    bucket: str = "input-bucket",
+    unknown_rate: float = 0.1,
+    max_pages: int = 20,
+    page_kb: float = 0.0,
+    duplicate_rate: float = 0.0,
+    form_letter_rate: float = 0.0,
+    seed: int = 0,
+) -> dict[str, str]:
+    """
+    Generates ``n_documents`` PDFs plus consistent reference data.
+
+    ``unknown_rate`` of the documents name someone missing from the registry
+    (they must end up as "Nessun dipendente"). Page counts follow a
+    heavy-tailed distribution capped at ``max_pages``. ``duplicate_rate`` of
+    the documents are copies of an earlier one under another name: half
+    byte-identical, half with the same text but different bytes (a re-scan).
+    ``form_letter_rate`` of the documents are an earlier letter (same date,
+    same text) addressed to another employee: they are not duplicates.
+    Returns the paths to plug into the pipeline config.
+    """
+    rng = random.Random(seed)
+    n_personnel = n_personnel or max(10, n_documents // 5)
+    data_dir = os.path.join(out_dir, "etl_db_data")
+    docs_dir = os.path.join(out_dir, "gcs", bucket, "documents")
+    os.makedirs(data_dir, exist_ok=True)
+    # a previous corpus with other parameters must not leak into this one
+    shutil.rmtree(docs_dir, ignore_errors=True)
+    os.makedirs(docs_dir, exist_ok=True)
+
+    personnel = []
+    for i in range(n_personnel):
+        personnel.append(
+            {
+                "Person Number": str(100000 + i),
+                "Nome": rng.choice(FIRST_NAMES),
+                "Cognome": rng.choice(LAST_NAMES),
+            }
+        )
+    paths = {
+        "PERSONALE_PATH": os.path.join(data_dir, "personale.csv"),
+        "CLUSTERS_PATH": os.path.join(data_dir, "clusters.csv"),
+        "TRAIN_GT_PATH": os.path.join(data_dir, "doc_trains.csv"),
+    }
+    with open(paths["PERSONALE_PATH"], "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["Person Number", "Nome", "Cognome"])
+        writer.writeheader()
+        writer.writerows(personnel)
+    with open(paths["CLUSTERS_PATH"], "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Cluster"])
+        writer.writerows([c] for c in CLUSTERS + ["Nessun cluster"])
+
+    start_date = date(2000, 1, 1)
+    generated = []  # (pages, gt row, cluster) of the original documents
+    with open(paths["TRAIN_GT_PATH"], "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Nome file", "Cluster", "Nominativo", "Data"])
+        for i in range(n_documents):
+            filename = f"{i:013d}_{rng.randrange(10**6, 10**7)}.pdf"
+            if generated and rng.random() < duplicate_rate:
+                pages, row, _ = rng.choice(generated)
+                rescan = rng.random() < 0.5
+                write_pdf(
+                    os.path.join(docs_dir, filename),
+                    pages,
+                    padding_bytes=int(page_kb * 1024) + (64 if rescan else 0),
+                )
+                writer.writerow([filename, *row])
+                continue
+            if generated and rng.random() < form_letter_rate:
+                pages, row, cluster = rng.choice(generated)
+                person = rng.choice(personnel)
+                while (
+                    pages[0][0] == f"Dipendente: {person['Nome']} {person['Cognome']}"
+                ):
+                    person = rng.choice(personnel)
+                nome, cognome = person["Nome"], person["Cognome"]
+                first_page = [f"Dipendente: {nome} {cognome}", *pages[0][1:]]
+                write_pdf(
+                    os.path.join(docs_dir, filename),
+                    [first_page, *pages[1:]],
+                    padding_bytes=int(page_kb * 1024),
+                )
+                writer.writerow([filename, cluster, f"{cognome} {nome}", row[2]])
+                continue
+
+            doc_date = start_date + timedelta(days=rng.randrange(9000))
+            cluster = rng.choice(CLUSTERS)
+            if rng.random() < unknown_rate:
+                nome, cognome = "Sconosciuto", f"Esterno{i}"
+                # documents of non-employees are discarded by the pipeline
+                nominativo, gt_cluster = "Nessun dipendente", "SCARTATO"
+            else:
+                person = rng.choice(personnel)
+                nome, cognome = person["Nome"], person["Cognome"]
+                nominativo, gt_cluster = f"{cognome} {nome}", cluster
+            n_pages = min(max_pages, int(rng.paretovariate(1.5)))
+
+            first_page = [
+                f"Dipendente: {nome} {cognome}",
+                f"Data: {doc_date.isoformat()}",
+                f"Oggetto: {cluster}",
+                f"Paese: {rng.choice(COUNTRIES)}",
+                *rng.sample(LETTER_BODY, 6),
+                FILLER,
+            ]
+            pages = [first_page] + [[FILLER] * 3 for _ in range(n_pages - 1)]
+            write_pdf(
+                os.path.join(docs_dir, filename),
+                pages,
+                padding_bytes=int(page_kb * 1024),
+            )
+            row = [gt_cluster, nominativo, doc_date.strftime("%d/%m/%Y")]
+            writer.writerow([filename, *row])
+            generated.append((pages, row, cluster))
+
+    return {
+        **paths,
+        "FAKE_ROOT": os.path.join(out_dir, "gcs"),
+        "INPUT_BUCKET": bucket,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--personnel", type=int, default=None)
+    parser.add_argument("--unknown-rate", type=float, default=0.1)
+    parser.add_argument("--max-pages", type=int, default=20)
+    parser.add_argument("--page-kb", type=float, default=0.0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--form-letter-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(
+        args.out,
+        args.documents,
+        n_personnel=args.personnel,
+        unknown_rate=args.unknown_rate,
+        max_pages=args.max_pages,
+        page_kb=args.page_kb,
+        duplicate_rate=args.duplicate_rate,
+        form_letter_rate=args.form_letter_rate,
+        seed=args.seed,
+    )
+    for key, value in paths.items():
+        print(f"{key}={value}")